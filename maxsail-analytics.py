@@ -26,13 +26,20 @@ from scipy.stats import circstd, circmean
 
 from utils import (
     distance_on_axis, 
-    gpx_file_to_df,
     linea_perpendicular_pyproj,
     puntos_perpendiculares_pyproj,
     calcular_twa_vmg,
     ladder_distance_rung,
+    utm_epsg,
     circular_modes_deg,
-    sog_modes
+    sog_modes,
+    load_tracks_cached,
+    concat_tracks,
+    track_memory_footprint,
+    detectar_maniobras_cog,
+    filtrar_maniobras_cercanas,
+    velocidad_en_maniobras,
+    tramos_vmg_extremos,
 )
 
 def mean_circ_signed_deg(series):
@@ -41,73 +48,6 @@ def mean_circ_signed_deg(series):
         return np.nan
     return float(circmean(s, high=180, low=-180))
 
-# -----------------------------
-# Vakaros import helpers (CSV)
-# -----------------------------
-
-from math import radians, sin, cos, asin, sqrt
-
-def _haversine_m(lat1, lon1, lat2, lon2):
-    """Great-circle distance in meters."""
-    R = 6371000.0
-    phi1, phi2 = radians(lat1), radians(lat2)
-    dphi = radians(lat2 - lat1)
-    dl = radians(lon2 - lon1)
-    a = sin(dphi/2)**2 + cos(phi1)*cos(phi2)*sin(dl/2)**2
-    return 2 * R * asin(sqrt(a))
-
-def _ensure_dist_column(df):
-    """Add Dist column (meters between consecutive points)."""
-    if df.empty:
-        df["Dist"] = []
-        return df
-
-    d = [0.0]
-    for i in range(1, len(df)):
-        d.append(_haversine_m(
-            df.loc[i-1, "Lat"], df.loc[i-1, "Lon"],
-            df.loc[i, "Lat"], df.loc[i, "Lon"]
-        ))
-    df["Dist"] = d
-    return df
-
-def normalize_vakaros_csv(df_raw, source_name):
-    """Map Vakaros CSV columns to maxSail normalized schema."""
-    df = df_raw.copy()
-
-    # expected columns from Vakaros:
-    # timestamp,latitude,longitude,sog_kts,cog,hdg_true,heel,trim
-    df = df.rename(columns={
-        "timestamp": "UTC",
-        "latitude": "Lat",
-        "longitude": "Lon",
-        "sog_kts": "SOG",
-        "cog": "COG",
-    })
-
-    # Compatibilidad maxSail: el core usa SOGS en varios sitios
-    if "SOG" in df.columns and "SOGS" not in df.columns:
-        df["SOGS"] = df["SOG"]
-
-    # Normaliza tiempo: convierte a UTC real y deja naive (datetime64[ns])
-    df["UTC"] = pd.to_datetime(df["UTC"], utc=True).dt.tz_convert(None)
-
-    # Coerce numeric
-    for c in ["Lat", "Lon", "SOG", "SOGS", "COG"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-
-    # Orden / limpieza básica
-    df = df.dropna(subset=["UTC", "Lat", "Lon"]).sort_values("UTC").reset_index(drop=True)
-
-    # Distancia incremental
-    df = _ensure_dist_column(df)
-
-    # Metadato útil
-    df["SourceFile"] = source_name
-
-    return df
-
 # -----------------------------
 # INICIO APP STREAMLIT
 # -----------------------------
@@ -126,18 +66,18 @@ map_style = MAPTILER_STYLES[fondo]
 
 # --- Sidebar: subir archivo GPX ---
 uploaded_files = st.sidebar.file_uploader(
-    "📂 Selecciona uno o más archivos GPX o CSV", 
-    type=["gpx", "csv"], 
+    "📂 Selecciona uno o más archivos GPX, CSV, FIT o VKX", 
+    type=["gpx", "csv", "fit", "vkx"], 
     accept_multiple_files=True
 )
 
 if not uploaded_files:
-    st.info("Sube al menos un archivo GPX o CSV para comenzar.")
+    st.info("Sube al menos un archivo GPX, CSV, FIT o VKX para comenzar.")
     st.markdown("""
 
-    **maxSail-analytics** es una herramienta open source para visualizar, analizar y comparar tracks GPS de regatas y entrenamientos de vela. Permite cargar archivos GPX o CSV, mostrar recorridos en mapa, comparar dos tracks, analizar métricas clave y detectar maniobras, todo de forma sencilla y colaborativa.
+    **maxSail-analytics** es una herramienta open source para visualizar, analizar y comparar tracks GPS de regatas y entrenamientos de vela. Permite cargar archivos GPX, CSV, FIT o VKX, mostrar recorridos en mapa, comparar dos tracks, analizar métricas clave y detectar maniobras, todo de forma sencilla y colaborativa.
 
-    **maxSail-analytics** is an open source tool to visualize, analyze and compare GPS tracks from sailing races and training. You can load GPX or CSV files, display tracks on an interactive map, compare two routes, analyze key metrics, and detect maneuvers—everything simply and collaboratively.
+    **maxSail-analytics** is an open source tool to visualize, analyze and compare GPS tracks from sailing races and training. You can load GPX, CSV, FIT or VKX files, display tracks on an interactive map, compare two routes, analyze key metrics, and detect maneuvers—everything simply and collaboratively.
 
     ---
 
@@ -153,8 +93,8 @@ if not uploaded_files:
     *Automatic maneuver detection (tacks/gybes).*
     - Cálculo y visualización de métricas clave.  
     *Calculation and visualization of key metrics.*
-    - Compatible con archivos GPX y CSV normalizados.  
-    *Compatible with normalized GPX and CSV files.*
+    - Compatible con archivos GPX, CSV (normalizado o de Vakaros), FIT y VKX.  
+    *Compatible with GPX, CSV (normalized or Vakaros), FIT and VKX files.*
     - Interfaz intuitiva, lista para compartir con la flota.  
     *Intuitive interface, ready to share with your fleet.*
     - **Open source y multiplataforma.**  
@@ -191,37 +131,27 @@ if not uploaded_files:
     st.stop()
 
 
+# Cada archivo se normaliza una sola vez: los reruns (sliders, TWD...) reutilizan
+# el DataFrame ya calculado, identificado por el hash de su contenido.
+# Los archivos nuevos se parsean en paralelo (varios procesos), manteniendo el orden.
 dfs = []
-for file in uploaded_files:
-    if file.name.lower().endswith('.csv'):
-        df_raw = pd.read_csv(file, delimiter=',')
-
-        # 1) Normalizado maxSail
-        if all(col in df_raw.columns for col in ['Lat', 'Lon', 'UTC', 'COG', 'SOG', 'Dist']):
-            df = df_raw
-            if not np.issubdtype(df['UTC'].dtype, np.datetime64):
-                df['UTC'] = pd.to_datetime(df['UTC'], errors='coerce')
-
-        # 2) Vakaros CSV (timestamp, latitude, longitude, sog_kts, cog, ...)
-        elif all(col in df_raw.columns for col in ['timestamp', 'latitude', 'longitude', 'sog_kts', 'cog']):
-            df = normalize_vakaros_csv(df_raw, file.name)
-
-        else:
-            st.warning(f"El archivo {file.name} no tiene columnas requeridas.")
-            continue
-
-        if "SourceFile" not in df.columns:
-            df["SourceFile"] = file.name
+resultados = load_tracks_cached([(file.getvalue(), file.name) for file in uploaded_files])
+for df, aviso in resultados:
+    if aviso:
+        st.warning(aviso)
+        continue
+    if not df.empty:
         dfs.append(df)
-    elif file.name.lower().endswith('.gpx'):
-        df = gpx_file_to_df(file, file.name)
-        if not df.empty:
-            dfs.append(df)
 if not dfs:
     st.error("No se encontraron tracks válidos.")
     st.stop()
 
-df = pd.concat(dfs, ignore_index=True)
+df = concat_tracks(dfs)
+mem_antes, mem_despues = track_memory_footprint(df)
+st.sidebar.caption(
+    f"🧠 Memoria tracks: {mem_despues / 1e6:.1f} MB "
+    f"(esquema anterior: {mem_antes / 1e6:.1f} MB)"
+)
 
 # --- Selección de tracks ---
 if "SourceFile" in df.columns:
@@ -448,8 +378,8 @@ if df1.empty and df2.empty:
 # --- MAPA: Visualización comparada ---
 
 # Calcula el SOG promedio total de cada track
-sog_avg_azul = round(df1['SOG'].mean(), 2) if not df1.empty else 0
-sog_avg_naranja = round(df2['SOG'].mean(), 2) if not df2.empty else 0
+sog_avg_azul = round(float(df1['SOG'].mean()), 2) if not df1.empty else 0
+sog_avg_naranja = round(float(df2['SOG'].mean()), 2) if not df2.empty else 0
 
 st.subheader("📍 Mapa - visualización de tracks")
 layers = []
@@ -778,8 +708,13 @@ if not df1.empty and not df2.empty and twd is not None:
     dist_peldaños_fin = distance_on_axis(lat1_fin, lon1_fin, lat2_fin, lon2_fin, twd)
 
     # Opcional: también puedes calcular la separación sobre el eje del viento (avance hacia boya/barlovento/sotavento)
-    dist_eje_ini = ladder_distance_rung(lat1_ini, lon1_ini, lat2_ini, lon2_ini, twd)
-    dist_eje_fin = ladder_distance_rung(lat1_fin, lon1_fin, lat2_fin, lon2_fin, twd)
+    # Una sola zona UTM (centroide de los dos tracks) para que inicio y fin sean comparables
+    epsg = utm_epsg(
+        np.concatenate((df1["Lat"].to_numpy(float), df2["Lat"].to_numpy(float))),
+        np.concatenate((df1["Lon"].to_numpy(float), df2["Lon"].to_numpy(float))),
+    )
+    dist_eje_ini = ladder_distance_rung(lat1_ini, lon1_ini, lat2_ini, lon2_ini, twd, epsg=epsg)
+    dist_eje_fin = ladder_distance_rung(lat1_fin, lon1_fin, lat2_fin, lon2_fin, twd, epsg=epsg)
 
     N = 30  # Número de puntos a promediar para inicio y fin
     def tramo_tipo_twa(twa_mean):
@@ -1648,71 +1583,15 @@ tiempo_minimo = st.number_input(
     help="Descarta maniobras consecutivas muy cercanas en el tiempo"
 )
 
-def circ_diff_deg(a, b):
-    """Diferencia angular mínima en grados (resultado en [-180, +180])."""
-    return (a - b + 180) % 360 - 180
-
-# --- Detección de maniobras (con COG circular) ---
-maniobra_points = []
-if not df_plot.empty:
-    for track in df_plot['Track'].unique():
-        track_df = (
-            df_plot[df_plot['Track'] == track]
-            .sort_values('UTC')
-            .reset_index(drop=True)
-        )
+# --- Detección de maniobras (con COG circular, medias móviles en O(n)) ---
+maniobra_df = detectar_maniobras_cog(df_plot, umbral=umbral_maniobra, window=window)
 
-        # Asegura dominio [0,360) para cálculos circulares
-        cogs = np.mod(track_df['COG'].values, 360.0)
-        times = track_df['UTC'].values
-
-        for i in range(window, len(cogs) - window):
-            ventana_prev = cogs[i - window : i]
-            ventana_post = cogs[i + 1 : i + 1 + window]
-
-            # Medias CIRCULARES de ventanas
-            media_prev = float(circmean(ventana_prev, high=360, low=0))
-            media_post = float(circmean(ventana_post, high=360, low=0))
-
-            # Diferencias CIRCULARES con el punto actual
-            diff_prev = abs(circ_diff_deg(cogs[i], media_prev))
-            diff_post = abs(circ_diff_deg(cogs[i], media_post))
-
-            # Usa la mayor (o podrías usar el promedio) como “intensidad” de maniobra
-            diff = max(diff_prev, diff_post)
-
-            if diff > umbral_maniobra:
-                maniobra_points.append({
-                    "UTC": times[i],
-                    "COG": cogs[i],
-                    "COG_previo": media_prev,
-                    "COG_post": media_post,
-                    "Track": track,
-                    "idx": i,
-                })
-maniobra_df = pd.DataFrame(maniobra_points)
-
-# --- Sincronizar maniobra_df con tiempo relativo ---
-if not maniobra_df.empty:
-    maniobra_df = maniobra_df.merge(
-        df_plot[['UTC', 'Track', 'Tiempo_relativo_min']],
-        on=['UTC', 'Track'],
-        how='left'
-    )
+# --- Sincronizar maniobra_df con tiempo relativo (por posición en df_plot, sin merge) ---
+if not maniobra_df.empty and 'Tiempo_relativo_min' in df_plot:
+    maniobra_df['Tiempo_relativo_min'] = df_plot['Tiempo_relativo_min'].to_numpy()[maniobra_df['pos'].to_numpy()]
 
 # --- Filtro: eliminar maniobras muy cercanas en el tiempo ---
-if not maniobra_df.empty:
-    maniobra_df = maniobra_df.sort_values(['Track', 'UTC']).reset_index(drop=True)
-    maniobra_df["keep"] = True
-    for track in maniobra_df['Track'].unique():
-        track_df_m = maniobra_df[maniobra_df["Track"] == track]
-        last_time = None
-        for i, row in track_df_m.iterrows():
-            if last_time is not None and (row["UTC"] - last_time).total_seconds() < tiempo_minimo:
-                maniobra_df.at[i, "keep"] = False
-            else:
-                last_time = row["UTC"]
-    maniobra_df = maniobra_df[maniobra_df["keep"]].reset_index(drop=True)
+maniobra_df = filtrar_maniobras_cercanas(maniobra_df, tiempo_minimo)
 
 # --- VISUALIZACIÓN DEL GRÁFICO ---
 chart_cog = alt.Chart(df_plot).mark_line(opacity=1).encode(
@@ -1777,32 +1656,30 @@ else:
     t_prev = 8   # segundos antes de la maniobra para calcular SOG previa
     t_post_max = 30  # segundos después para buscar la recuperación
 
-    for idx, maniobra in maniobra_df.iterrows():
+    # SOG previa, recuperación y medias por ventana: un índice temporal por track
+    n_maniobras = len(maniobra_df)
+    sog_previas = np.full(n_maniobras, np.nan)
+    recuperaciones = np.full(n_maniobras, t_post_max + 1)  # o "No recuperada" si prefieres
+    medias_ventanas = np.full((n_maniobras, len(ventanas)), np.nan)
+    tracks_maniobras = maniobra_df["Track"].to_numpy()
+    for track in maniobra_df["Track"].unique():
+        filas = np.flatnonzero(tracks_maniobras == track)
+        df_este_track = df_plot[df_plot["Track"] == track]
+        res = velocidad_en_maniobras(
+            df_este_track["UTC"], df_este_track["SOG"], maniobra_df["UTC"].values[filas],
+            ventanas, t_prev=t_prev, t_post_max=t_post_max
+        )
+        sog_previas[filas] = res["sog_previa"]
+        recuperaciones[filas] = res["recuperacion"]
+        medias_ventanas[filas] = res["medias"]
+
+    for k, maniobra in enumerate(maniobra_df.to_dict("records")):
         track = maniobra["Track"]
         time = maniobra["UTC"]
-        df_este_track = df_plot[df_plot["Track"] == track]
         delta_cog = ((maniobra["COG_post"] - maniobra["COG_previo"] + 180) % 360) - 180
         delta_cog = round(delta_cog, 0)
-
-        # SOG previa a la maniobra
-        rango_previo = (time - pd.Timedelta(seconds=t_prev), time)
-        sog_previa = df_este_track[
-            (df_este_track["UTC"] >= rango_previo[0]) & (df_este_track["UTC"] <= rango_previo[1])
-        ]["SOG"].mean()
-
-        # Tiempo hasta recuperar SOG previa después de la maniobra
-        tiempo_recuperacion = None
-        for t in range(1, t_post_max + 1):
-            instante = time + pd.Timedelta(seconds=t)
-            sog_inst = df_este_track[
-                (df_este_track["UTC"] >= instante - pd.Timedelta(seconds=0.5)) &
-                (df_este_track["UTC"] <= instante + pd.Timedelta(seconds=0.5))
-            ]["SOG"].mean()
-            if not np.isnan(sog_inst) and sog_inst >= sog_previa:
-                tiempo_recuperacion = t
-                break
-        if tiempo_recuperacion is None:
-            tiempo_recuperacion = t_post_max + 1  # o "No recuperada" si prefieres
+        sog_previa = sog_previas[k]
+        tiempo_recuperacion = int(recuperaciones[k])
 
         fila = {
             "Track": track,
@@ -1813,17 +1690,7 @@ else:
             "SOG previa": f"{sog_previa:.2f}" if not np.isnan(sog_previa) else "-",
             "Recup. SOG (s)": tiempo_recuperacion if tiempo_recuperacion <= t_post_max else "+30",
         }
-        for delta, label in zip(ventanas, ventana_labels):
-            if delta == 0:
-                rango = (time - pd.Timedelta(seconds=0.5), time + pd.Timedelta(seconds=0.5))
-            elif delta < 0:
-                rango = (time + pd.Timedelta(seconds=delta), time)
-            else:
-                rango = (time, time + pd.Timedelta(seconds=delta))
-            tramo = df_este_track[
-                (df_este_track["UTC"] >= rango[0]) & (df_este_track["UTC"] <= rango[1])
-            ]
-            vel_media = tramo["SOG"].mean()
+        for vel_media, label in zip(medias_ventanas[k], ventana_labels):
             fila[label] = f"{vel_media:.2f}" if not np.isnan(vel_media) else "-"
         tabla.append(fila)
 
@@ -1968,183 +1835,76 @@ st.dataframe(ranking_df, use_container_width=True)
 
 # MEJOR Y PEOR TRAMO
 
-# Tamaño de la ventana (en puntos consecutivos)
-window = 20  # Tamaño de la ventana (en puntos consecutivos)
-window = st.number_input(
-    "Tamaño de la ventana deslizante (n° de puntos)",
-    min_value=10, max_value=120, value=20, step=5,
-    help="Cantidad de puntos para calcular mejor/peor ceñida y popa"
+# Duración de la ventana (en segundos, sobre la hora UTC)
+ventana_s = st.number_input(
+    "Duración de la ventana deslizante (segundos)",
+    min_value=5, max_value=600, value=20, step=5,
+    help="Segundos continuos dentro de la banda de TWA para calcular mejor/peor ceñida y popa. "
+         "Una ventana nunca une puntos separados por un cambio de banda o un hueco de grabación."
 )
 
-# -------- Mejor ceñida / popa --------
-st.subheader("⛵ Mejor tramo de ceñida / popa de cada track")
-mejor_tramos = []
+tramos_top_k = st.number_input(
+    "Tramos por tipo (sin solaparse)",
+    min_value=1, max_value=5, value=1, step=1,
+    help="Cuántos mejores/peores tramos de ceñida y popa mostrar por track"
+)
 
-for i, df in enumerate(track_dfs):
-    if df.empty:
-        for tramo, rango, label in [
-            ("ceñida", (40, 70), "ceñida"),
-            ("popa", (135, 180), "popa")
-            #("través",(71,134),"través")
-        ]:
-            mejor_tramos.append({
-                "Track": track_labels[i], 
-                "Tipo": label,
-                "TWA inicio": "-", 
-                "TWA fin": "-", 
-                "UTC inicio": "-", 
-                "UTC fin": "-",
-                "VMG promedio": "-", 
-                "Duración (s)": "-", 
-                "Distancia (m)": "-"
-            })
-        continue
+def fila_tramo(track_label, label, tramo=None, n=1):
+    """Fila de la tabla de mejor/peor tramo ('-' si no hay tramo)."""
+    fila = {"Track": track_label, "Tipo": label}
+    if tramos_top_k > 1:
+        fila["Nº"] = n
+    if tramo is None:
+        fila.update({
+            "TWA inicio": "-", 
+            "TWA fin": "-", 
+            "UTC inicio": "-", 
+            "UTC fin": "-",
+            "VMG promedio": "-", 
+            "Duración (s)": "-", 
+            "Distancia (m)": "-"
+        })
+        return fila
+    duracion = (pd.to_datetime(tramo["UTC_fin"]) - pd.to_datetime(tramo["UTC_ini"])).total_seconds()
+    fila.update({
+        "TWA inicio": f"{tramo['TWA_ini']:.1f}", 
+        "TWA fin": f"{tramo['TWA_fin']:.1f}",
+        "UTC inicio": pd.to_datetime(tramo["UTC_ini"]).strftime("%H:%M:%S"),
+        "UTC fin": pd.to_datetime(tramo["UTC_fin"]).strftime("%H:%M:%S"),
+        "VMG promedio": f"{tramo['VMG']:.2f}",
+        "Duración (s)": f"{duracion:.1f}", 
+        "Distancia (m)": f"{tramo['Dist']:.1f}"
+    })
+    return fila
 
-    for tramo, rango, label in [
-        ("ceñida", (40, 70), "ceñida"),
-        ("popa", (135, 180), "popa")
-        #("través",(71,134),"través")
+# Una sola pasada por track y tipo: medias de VMG en ventanas de ventana_s segundos
+# dentro de cada segmento continuo de la banda de TWA (sumas acumuladas + searchsorted).
+# Ceñida: mejor = VMG máximo (más positivo), peor = mínimo.
+# Popa: mejor = VMG mínimo (más negativo), peor = máximo (más cercano a cero).
+mejor_tramos = []
+peor_tramos = []
+for i, df in enumerate(track_dfs):
+    for tramo, rango, label, clave_mejor, clave_peor in [
+        ("ceñida", (40, 70), "ceñida", "max", "min"),
+        ("popa", (135, 180), "popa", "min", "max")
+        #("través",(71,134),"través", "max", "min")
     ]:
-        df_rango = df[(df["TWA"].abs() >= rango[0]) & (df["TWA"].abs() <= rango[1])].reset_index(drop=True)
-        if len(df_rango) < window:
-            mejor_tramos.append({
-                "Track": track_labels[i], 
-                "Tipo": label,
-                "TWA inicio": "-", 
-                "TWA fin": "-", 
-                "UTC inicio": "-", 
-                "UTC fin": "-",
-                "VMG promedio": "-", 
-                "Duración (s)": "-", 
-                "Distancia (m)": "-"
-            })
-            continue
-
-        idx_best = -1
-        if label == "ceñida":
-            # Ceñida: buscar máximo VMG promedio (más positivo)
-            best_vmg = float('-inf')
-            for idx in range(len(df_rango) - window + 1):
-                vmg_prom = df_rango.loc[idx:idx+window-1, "VMG"].mean()
-                if vmg_prom > best_vmg:
-                    best_vmg = vmg_prom
-                    idx_best = idx
-            vmg_val = best_vmg
-        else:
-            # Popa: buscar mínimo VMG promedio (más negativo)
-            best_vmg = float('inf')
-            for idx in range(len(df_rango) - window + 1):
-                vmg_prom = df_rango.loc[idx:idx+window-1, "VMG"].mean()
-                if vmg_prom < best_vmg:
-                    best_vmg = vmg_prom
-                    idx_best = idx
-            vmg_val = best_vmg
-
-        tramo_best = df_rango.loc[idx_best:idx_best+window-1]
-        utc_ini = tramo_best["UTC"].iloc[0]
-        utc_fin = tramo_best["UTC"].iloc[-1]
-        twa_ini = tramo_best["TWA"].iloc[0]
-        twa_fin = tramo_best["TWA"].iloc[-1]
-        duracion = (pd.to_datetime(utc_fin) - pd.to_datetime(utc_ini)).total_seconds()
-        distancia = tramo_best["Dist"].sum()
-
-        mejor_tramos.append({
-            "Track": track_labels[i], 
-            "Tipo": label,
-            "TWA inicio": f"{twa_ini:.1f}", 
-            "TWA fin": f"{twa_fin:.1f}",
-            "UTC inicio": pd.to_datetime(utc_ini).strftime("%H:%M:%S"),
-            "UTC fin": pd.to_datetime(utc_fin).strftime("%H:%M:%S"),
-            "VMG promedio": f"{vmg_val:.2f}",
-            "Duración (s)": f"{duracion:.1f}", 
-            "Distancia (m)": f"{distancia:.1f}"
-        })
+        extremos = {"max": [], "min": []}
+        if not df.empty:
+            extremos = tramos_vmg_extremos(df, ventana_s, rango, top_k=tramos_top_k)
+        for tabla, clave in [(mejor_tramos, clave_mejor), (peor_tramos, clave_peor)]:
+            if not extremos[clave]:
+                tabla.append(fila_tramo(track_labels[i], label))
+            for n, t in enumerate(extremos[clave], start=1):
+                tabla.append(fila_tramo(track_labels[i], label, t, n))
 
+# -------- Mejor ceñida / popa --------
+st.subheader("⛵ Mejor tramo de ceñida / popa de cada track")
 mejor_tramos_df = pd.DataFrame(mejor_tramos)
 st.dataframe(mejor_tramos_df, use_container_width=True)
 
 # -------- Peor ceñida / popa --------
 st.subheader("⛵ Peor tramo de ceñida / popa de cada track")
-peor_tramos = []
-
-for i, df in enumerate(track_dfs):
-    if df.empty:
-        for tramo, rango, label in [
-            ("ceñida", (40, 70), "ceñida"),
-            ("popa", (135, 180), "popa")
-        ]:
-            peor_tramos.append({
-                "Track": track_labels[i], 
-                "Tipo": label,
-                "TWA inicio": "-", 
-                "TWA fin": "-", 
-                "UTC inicio": "-", 
-                "UTC fin": "-",
-                "VMG promedio": "-", 
-                "Duración (s)": "-", 
-                "Distancia (m)": "-"
-            })
-        continue
-
-    for tramo, rango, label in [
-        ("ceñida", (40, 70), "ceñida"),
-        ("popa", (135, 180), "popa")
-    ]:
-        df_rango = df[(df["TWA"].abs() >= rango[0]) & (df["TWA"].abs() <= rango[1])].reset_index(drop=True)
-        if len(df_rango) < window:
-            peor_tramos.append({
-                "Track": track_labels[i], 
-                "Tipo": label,
-                "TWA inicio": "-", 
-                "TWA fin": "-", 
-                "UTC inicio": "-", 
-                "UTC fin": "-",
-                "VMG promedio": "-", 
-                "Duración (s)": "-", 
-                "Distancia (m)": "-"
-            })
-            continue
-
-        idx_worst = -1
-        if label == "ceñida":
-            # Ceñida: buscar mínimo VMG promedio (más bajo)
-            worst_vmg = float('inf')
-            for idx in range(len(df_rango) - window + 1):
-                vmg_prom = df_rango.loc[idx:idx+window-1, "VMG"].mean()
-                if vmg_prom < worst_vmg:
-                    worst_vmg = vmg_prom
-                    idx_worst = idx
-            vmg_val = worst_vmg
-        else:
-            # Popa: buscar máximo VMG promedio (menos negativo, más cercano a cero)
-            worst_vmg = float('-inf')
-            for idx in range(len(df_rango) - window + 1):
-                vmg_prom = df_rango.loc[idx:idx+window-1, "VMG"].mean()
-                if vmg_prom > worst_vmg:
-                    worst_vmg = vmg_prom
-                    idx_worst = idx
-            vmg_val = worst_vmg
-
-        tramo_worst = df_rango.loc[idx_worst:idx_worst+window-1]
-        utc_ini_w = tramo_worst["UTC"].iloc[0]
-        utc_fin_w = tramo_worst["UTC"].iloc[-1]
-        twa_ini_w = tramo_worst["TWA"].iloc[0]
-        twa_fin_w = tramo_worst["TWA"].iloc[-1]
-        duracion_w = (pd.to_datetime(utc_fin_w) - pd.to_datetime(utc_ini_w)).total_seconds()
-        distancia_w = tramo_worst["Dist"].sum()
-
-        peor_tramos.append({
-            "Track": track_labels[i], 
-            "Tipo": label,
-            "TWA inicio": f"{twa_ini_w:.1f}", 
-            "TWA fin": f"{twa_fin_w:.1f}",
-            "UTC inicio": pd.to_datetime(utc_ini_w).strftime("%H:%M:%S"),
-            "UTC fin": pd.to_datetime(utc_fin_w).strftime("%H:%M:%S"),
-            "VMG promedio": f"{vmg_val:.2f}",
-            "Duración (s)": f"{duracion_w:.1f}", 
-            "Distancia (m)": f"{distancia_w:.1f}"
-        })
-
 peor_tramos_df = pd.DataFrame(peor_tramos)
 st.dataframe(peor_tramos_df, use_container_width=True)
 
@@ -0,0 +1,132 @@
+"""maxSail batch ingest: normaliza por lotes una carpeta de tracks.
+
+Recorre una carpeta (GPX / CSV / VKX / FIT y sus ficheros <nombre>-meta-data.json),
+normaliza los tracks en paralelo y los guarda en el almacén de tracks de
+maxsail-analytics (Feather, ver utils.TRACK_STORE_DIR) junto con un index.json.
+Después, al subir cualquiera de esos archivos al visor, se encuentra en el almacén
+por el hash de su contenido y no se vuelve a parsear. El visor no lee el index.json:
+es el catálogo de la biblioteca de sesiones (archivo, ruta, hash, puntos, inicio/fin
+y meta-data) para consultarlo o usarlo desde otras herramientas.
+El index.json se acumula entre ejecuciones: cada sesión se identifica por el hash
+de su contenido, así que ingerir otra carpeta añade sus sesiones sin perder las ya
+registradas (y reingerir un archivo actualiza su entrada). Los archivos que no se
+han podido normalizar no son sesiones: van en "errores" (solo los de la última
+ejecución), con estado "error" y su aviso.
+
+Uso:
+    python maxsail-batch-ingest.py CARPETA [--store .maxsail-cache] [--workers N] [--force]
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
+
+import utils
+from utils import TRACK_FILE_EXTENSIONS, ingest_track_file, track_store_index_path, track_store_tag
+
+META_SUFFIX = "-meta-data.json"
+
+
+def buscar_archivos(carpeta):
+    """Devuelve (tracks, metas): rutas de tracks y {ruta_track: meta-data} de los sidecars."""
+    tracks, metas_json = [], []
+    for raiz, _, nombres in os.walk(carpeta):
+        for nombre in sorted(nombres):
+            ruta = os.path.join(raiz, nombre)
+            if nombre.endswith(META_SUFFIX):
+                metas_json.append(ruta)
+            elif nombre.lower().endswith(TRACK_FILE_EXTENSIONS):
+                tracks.append(ruta)
+    tracks.sort()
+
+    por_base = {os.path.splitext(t)[0]: t for t in tracks}
+    por_nombre = {os.path.basename(t): t for t in tracks}
+    metas = {}
+    for ruta in metas_json:
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Meta-data ilegible {ruta}: {e}", file=sys.stderr)
+            continue
+        # <nombre>-meta-data.json junto a <nombre>.<ext>, o el ARCHIVO_TRACK indicado dentro
+        track = por_base.get(ruta[: -len(META_SUFFIX)]) or por_nombre.get(str(meta.get("ARCHIVO_TRACK", "")).strip())
+        if track:
+            metas[track] = meta
+        else:
+            print(f"⚠️  Meta-data sin track: {ruta}", file=sys.stderr)
+    return tracks, metas
+
+
+def cargar_indice(ruta_indice):
+    """Sesiones del index.json existente, por hash. Vacío si no existe o no se puede leer.
+    Se descartan las entradas fallidas que índices anteriores guardaban como sesiones.
+    """
+    try:
+        with open(ruta_indice, encoding="utf-8") as f:
+            indice = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if indice.get("tag") != track_store_tag():
+        return {}
+    return {
+        s["hash"]: s for s in indice.get("sesiones", [])
+        if s.get("hash") and s.get("estado", "ok") == "ok" and s.get("aviso") is None and s.get("puntos")
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normaliza por lotes una carpeta de tracks para maxsail-analytics.")
+    parser.add_argument("carpeta", help="Carpeta con archivos GPX / CSV / VKX / FIT (se recorre recursivamente)")
+    parser.add_argument("--store", default=None, help=f"Carpeta del almacén (por defecto {utils.TRACK_STORE_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="Número de procesos (por defecto, uno por CPU)")
+    parser.add_argument("--force", action="store_true", help="Vuelve a normalizar aunque el track ya esté en el almacén")
+    args = parser.parse_args(argv)
+
+    if utils.feather is None:
+        parser.error("El almacén de tracks requiere pyarrow. Instala: pip install pyarrow")
+
+    tracks, metas = buscar_archivos(args.carpeta)
+    if not tracks:
+        print("No se encontraron tracks.")
+        return 1
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        entradas = list(executor.map(ingest_track_file, tracks, repeat(args.store), repeat(args.force)))
+
+    ruta_indice = track_store_index_path(args.store)
+    sesiones = cargar_indice(ruta_indice)
+    errores = []
+    for entrada in entradas:
+        entrada["meta"] = metas.get(entrada["ruta"])
+        entrada["ruta"] = os.path.abspath(entrada["ruta"])
+        if entrada["estado"] == "ok":
+            print(f"{entrada['archivo']}: {entrada['puntos']} puntos")
+            sesiones[entrada["hash"]] = entrada
+        else:
+            print(f"{entrada['archivo']}: {entrada['aviso']}", file=sys.stderr)
+            sesiones.pop(entrada["hash"], None)
+            errores.append(entrada)
+
+    indice = {
+        "tag": track_store_tag(),
+        "generado": datetime.now(timezone.utc).isoformat(),
+        "sesiones": sorted(sesiones.values(), key=lambda e: e["ruta"]),
+        "errores": sorted(errores, key=lambda e: e["ruta"]),
+    }
+    os.makedirs(os.path.dirname(ruta_indice), exist_ok=True)
+    with open(ruta_indice, "w", encoding="utf-8") as f:
+        json.dump(indice, f, indent=2, ensure_ascii=False)
+
+    print(
+        f"✅ {len(entradas) - len(errores)}/{len(entradas)} tracks en el almacén. "
+        f"Índice ({len(sesiones)} sesiones, {len(errores)} errores): {ruta_indice}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,27 @@
 import streamlit as st
-import gpxpy
 import pandas as pd
 import pydeck as pdk
 from datetime import datetime, timedelta
 import os
 import io
-
-# Optional FIT support (requires: pip install fitparse)
-try:
-    from fitparse import FitFile
-except Exception:
-    FitFile = None
+import json
+import zipfile
+
+from utils import (
+    read_gpx_arrays,
+    read_vkx_arrays,
+    read_fit_arrays,
+    write_gpx,
+    index_gpx_trkpts,
+    trim_gpx_bytes,
+    export_tramos_zip,
+    resample_track,
+    tramos_to_zip,
+    detect_track_segments,
+    read_track_arrays,
+    merge_track_arrays,
+    gpx_time_warning,
+)
 
 st.set_page_config(page_title="maxSail GPX Cutter", layout="wide")
 st.title("⛵ maxSail GPX Cutter")
@@ -33,46 +44,51 @@ uploaded_file = st.sidebar.file_uploader(
 )
 
 # --- Funciones ---
-def gpx_to_df(gpx):
-    points = []
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                pt_data = {
-                    "lat": point.latitude,
-                    "lon": point.longitude,
-                    "time": point.time
-                }
-                # Capturamos posibles extensiones
-                if point.extensions:
-                    for ext in point.extensions:
-                        tag = ext.tag.lower()
-                        pt_data[tag] = ext.text
-                points.append(pt_data)
-    return pd.DataFrame(points)
-
-def df_to_gpx(df):
-    gpx = gpxpy.gpx.GPX()
-    gpx_track = gpxpy.gpx.GPXTrack()
-    gpx.tracks.append(gpx_track)
-    gpx_segment = gpxpy.gpx.GPXTrackSegment()
-    gpx_track.segments.append(gpx_segment)
-    for _, row in df.iterrows():
-        pt = gpxpy.gpx.GPXTrackPoint(
-            latitude=row.lat,
-            longitude=row.lon,
-            time=row.time
-        )
-        gpx_segment.points.append(pt)
-    return gpx.to_xml()
+def gpx_to_df(trk):
+    """DataFrame lat/lon/time (+ extensiones) a partir de los arrays de read_gpx_arrays.
+    Las extensiones llegan como canales float32 (heart_rate, cadence, temperature, speed...),
+    así que se recortan junto con el track con los mismos filtros vectorizados.
+    """
+    df = pd.DataFrame({
+        "lat": trk["lat"],
+        "lon": trk["lon"],
+        "time": pd.Series(trk["time"]).dt.tz_localize("UTC"),
+    })
+    # Canales de telemetría de <extensions>
+    for tag, values in trk["ext"].items():
+        df[tag] = values
+    return df
 
-def get_gpx_metadata(gpx, df):
+def df_to_gpx(df, extensions=False):
+    """GPX del recorte, escrito por bloques en un buffer en memoria (utils.write_gpx).
+    Con extensions=True se incluyen los canales de telemetría del DataFrame.
+    """
+    canales = None
+    if extensions:
+        canales = {c: df[c].to_numpy() for c in df.columns if c not in ("lat", "lon", "time", "minutes")}
+    buffer = io.BytesIO()
+    write_gpx(buffer, df["lat"].to_numpy(), df["lon"].to_numpy(), df["time"], ext=canales)
+    return buffer.getvalue()
+
+def resample_df(df, **kwargs):
+    """Remuestrea el recorte con utils.resample_track (hz / every_m, interpolar o diezmar)."""
+    canales = [c for c in df.columns if c not in ("lat", "lon", "time", "minutes")]
+    lat, lon, time, ext = resample_track(
+        df["lat"].to_numpy(), df["lon"].to_numpy(), df["time"].dt.tz_convert(None).to_numpy(),
+        ext={c: df[c].to_numpy() for c in canales}, **kwargs
+    )
+    out = pd.DataFrame({"lat": lat, "lon": lon, "time": pd.Series(time).dt.tz_localize("UTC")})
+    for c, values in ext.items():
+        out[c] = values
+    return out
+
+def get_gpx_metadata(trk, df):
     start_time = df['time'].min()
     end_time = df['time'].max()
     duration = end_time - start_time
-    device = gpx.creator if gpx.creator else "Desconocido"
-    num_tracks = len(gpx.tracks)
-    num_segments = sum(len(track.segments) for track in gpx.tracks)
+    device = trk["creator"] if trk["creator"] else "Desconocido"
+    num_tracks = trk["tracks"]
+    num_segments = trk["segments"]
     extra_fields = list(set(df.columns) - {"lat", "lon", "time"})
     return {
         "Fecha/hora inicio": start_time,
@@ -107,122 +123,106 @@ def filtrar_por_timestamp(df, ts_ini, ts_fin):
     return df
 
 
-# --- Importers: VKX / FIT -> GPX (in-memory) ---
-def vkx_bytes_to_gpx_xml(vkx_bytes: bytes, *, name: str = "Vakaros VKX") -> str:
-    """Convert Vakaros VKX bytes to GPX XML (minimal: lat/lon/time/ele).
-
-    Extracts row 0x02 per VKX v1.4 public specification.
-    """
-    import datetime as dt
-    import struct
-    import xml.etree.ElementTree as ET
-
-    # Fixed payload sizes by row key (bytes), per VKX spec.
-    row_sizes = {
-        0xFF: 7, 0xFE: 2, 0x02: 44, 0x03: 20, 0x04: 13, 0x05: 17, 0x06: 18,
-        0x08: 13, 0x0A: 16, 0x0B: 16, 0x0C: 12, 0x0F: 16, 0x10: 12,
-        # internal rows (skip correctly)
-        0x01: 32, 0x07: 12, 0x0E: 16, 0x20: 13, 0x21: 52,
-    }
-
-    bio = io.BytesIO(vkx_bytes)
-    pts = []
-
-    # Row 0x02: <Q ii 7f  => ts_ms, lat_e7, lon_e7, sog_mps, cog_rad, alt_m, qw,qx,qy,qz
-    fmt_02 = "<Qii" + "f" * 7
-
-    while True:
-        key_b = bio.read(1)
-        if not key_b:
-            break
-        key = key_b[0]
-        size = row_sizes.get(key)
-        if size is None:
-            # Unknown key: stop to avoid misalignment
-            break
-        payload = bio.read(size)
-        if len(payload) != size:
-            break
-
-        if key == 0x02:
-            ts_ms, lat_e7, lon_e7, sog_mps, cog_rad, alt_m, qw, qx, qy, qz = struct.unpack(fmt_02, payload)
-            t = dt.datetime.fromtimestamp(ts_ms / 1000.0, tz=dt.timezone.utc)
-            pts.append((t, lat_e7 * 1e-7, lon_e7 * 1e-7, float(alt_m)))
-
-    pts.sort(key=lambda x: x[0])
-
-    ns = "http://www.topografix.com/GPX/1/1"
-    ET.register_namespace("", ns)
-
-    gpx = ET.Element(f"{{{ns}}}gpx", attrib={"version": "1.1", "creator": "maxSail GPX Cutter"})
-    meta = ET.SubElement(gpx, f"{{{ns}}}metadata")
-    meta_time = pts[0][0] if pts else dt.datetime.now(dt.timezone.utc)
-    ET.SubElement(meta, f"{{{ns}}}time").text = meta_time.isoformat().replace("+00:00", "Z")
-
-    trk = ET.SubElement(gpx, f"{{{ns}}}trk")
-    ET.SubElement(trk, f"{{{ns}}}name").text = name
-    seg = ET.SubElement(trk, f"{{{ns}}}trkseg")
-
-    for t, lat, lon, ele in pts:
-        trkpt = ET.SubElement(seg, f"{{{ns}}}trkpt", attrib={"lat": f"{lat:.7f}", "lon": f"{lon:.7f}"})
-        ET.SubElement(trkpt, f"{{{ns}}}ele").text = f"{ele:.2f}"
-        ET.SubElement(trkpt, f"{{{ns}}}time").text = t.isoformat().replace("+00:00", "Z")
-
-    return ET.tostring(gpx, encoding="utf-8", xml_declaration=True).decode("utf-8")
-
-
-def fit_bytes_to_gpx_xml(fit_bytes: bytes, *, name: str = "FIT Track") -> str:
-    """Convert FIT bytes to GPX XML (minimal: lat/lon/time/ele)."""
-    if FitFile is None:
-        raise RuntimeError("Dependencia 'fitparse' no disponible. Instala: pip install fitparse")
-
-    import gpxpy.gpx
-
-    fit = FitFile(io.BytesIO(fit_bytes))
-    gpx = gpxpy.gpx.GPX()
-    track = gpxpy.gpx.GPXTrack()
-    track.name = name
-    gpx.tracks.append(track)
-    segment = gpxpy.gpx.GPXTrackSegment()
-    track.segments.append(segment)
-
-    for record in fit.get_messages('record'):
-        fields = {d.name: d.value for d in record}
-        if 'position_lat' in fields and 'position_long' in fields:
-            lat = fields['position_lat'] * (180 / 2**31)
-            lon = fields['position_long'] * (180 / 2**31)
-            elevation = fields.get('altitude')
-            time = fields.get('timestamp')
-            point = gpxpy.gpx.GPXTrackPoint(latitude=lat, longitude=lon, elevation=elevation, time=time)
-            segment.points.append(point)
-
-    return gpx.to_xml()
+# --- Sidebar: cortar todos los TRAMOS del meta-data (varios tracks a la vez) ---
+with st.sidebar.expander("📦 Cortar todos los TRAMOS (meta-data)"):
+    meta_lote = st.file_uploader("Meta-data JSON con TRAMOS", type=["json"], key="meta_lote")
+    tracks_lote = st.file_uploader(
+        "Tracks (GPX / VKX / FIT)",
+        type=["gpx", "vkx", "fit"],
+        accept_multiple_files=True,
+        key="tracks_lote",
+    )
+    if meta_lote and tracks_lote:
+        try:
+            tramos_lote = json.load(meta_lote).get("TRAMOS", [])
+        except Exception as e:
+            st.error(f"Error leyendo meta-data JSON: {e}")
+            tramos_lote = []
+        if not tramos_lote:
+            st.warning("El meta-data no tiene TRAMOS.")
+        else:
+            try:
+                zip_tramos, resumen_lote = export_tramos_zip(
+                    [(f.name, f.getvalue()) for f in tracks_lote], tramos_lote
+                )
+            except Exception as e:
+                st.error(f"No se pudieron cortar los tramos: {e}")
+            else:
+                st.dataframe(pd.DataFrame(resumen_lote), hide_index=True)
+                st.download_button(
+                    label=f"📥 Descargar {len(tramos_lote)} tramos × {len(tracks_lote)} tracks (zip)",
+                    data=zip_tramos,
+                    file_name="tramos-maxsail.zip",
+                    mime="application/zip",
+                )
+
+# --- Sidebar: unir varias grabaciones de una misma sesión ---
+with st.sidebar.expander("🔗 Unir varias grabaciones"):
+    archivos_union = st.file_uploader(
+        "Grabaciones (GPX / VKX / FIT)",
+        type=["gpx", "vkx", "fit"],
+        accept_multiple_files=True,
+        key="archivos_union",
+    )
+    gap_union = st.number_input("Hueco para nuevo segmento (s)", min_value=1, max_value=3600, value=60, step=5)
+    if archivos_union and len(archivos_union) > 1:
+        try:
+            union = merge_track_arrays(
+                [read_track_arrays(f.getvalue(), f.name) for f in archivos_union], max_gap_s=gap_union
+            )
+        except Exception as e:
+            st.error(f"No se pudieron unir las grabaciones: {e}")
+        else:
+            gpx_union = write_gpx(
+                io.BytesIO(), union["lat"], union["lon"], union["time"],
+                ele=union["ele"], ext=union["ext"], segment_starts=union["segment_starts"],
+            ).getvalue()
+            st.caption(
+                f"{len(union['lat'])} puntos · {union['duplicados']} duplicados descartados · "
+                f"{len(union['segment_starts']) + 1} segmentos · {len(gpx_union) / 1024:.0f} KB"
+            )
+            st.download_button(
+                label="📥 Descargar GPX unido",
+                data=gpx_union,
+                file_name="union-maxsail.gpx",
+                mime="application/gpx+xml",
+            )
 
 # --- Main ---
 if uploaded_file:
     ext = uploaded_file.name.lower().split(".")[-1]
 
+    # Para GPX se indexan los <trkpt> por bytes: el recorte puede copiar el XML original
+    gpx_bytes = gpx_index = None
     if ext == "gpx":
-        gpx = gpxpy.parse(uploaded_file)
+        gpx_bytes = uploaded_file.getvalue()
+        try:
+            trk = read_gpx_arrays(gpx_bytes, extensions=True)
+        except Exception as e:
+            st.error(f"No se pudo leer el archivo GPX: {e}")
+            st.stop()
+        gpx_index = index_gpx_trkpts(gpx_bytes, trk["time"])
+        aviso = gpx_time_warning(trk, uploaded_file.name)
+        if aviso:
+            st.warning(aviso)
     elif ext == "vkx":
-        vkx_bytes = uploaded_file.read()
-        gpx_xml = vkx_bytes_to_gpx_xml(vkx_bytes, name=os.path.splitext(uploaded_file.name)[0])
-        gpx = gpxpy.parse(io.StringIO(gpx_xml))
+        trk = read_vkx_arrays(uploaded_file, name=os.path.splitext(uploaded_file.name)[0])
     elif ext == "fit":
-        fit_bytes = uploaded_file.read()
         try:
-            gpx_xml = fit_bytes_to_gpx_xml(fit_bytes, name=os.path.splitext(uploaded_file.name)[0])
+            trk = read_fit_arrays(uploaded_file, name=os.path.splitext(uploaded_file.name)[0])
         except Exception as e:
-            st.error(f"No se pudo convertir FIT a GPX: {e}")
+            st.error(f"No se pudo leer el archivo FIT: {e}")
             st.stop()
-        gpx = gpxpy.parse(io.StringIO(gpx_xml))
     else:
         st.error("Formato no soportado. Usa GPX, VKX o FIT.")
         st.stop()
 
-    df = gpx_to_df(gpx)
+    df = gpx_to_df(trk)
     df['time'] = pd.to_datetime(df['time'])
-    df = df.sort_values('time').reset_index(drop=True)
+    df = df.dropna(subset=['time']).sort_values('time').reset_index(drop=True)
+    if df.empty:
+        st.error("El archivo no tiene puntos con hora válida.")
+        st.stop()
     total_duration = (df['time'].iloc[-1] - df['time'].iloc[0]).total_seconds() / 60
 
     # --- Sidebar: filtros de inicio/fin (en minutos y segundos) ---
@@ -259,7 +259,7 @@ if uploaded_file:
 
     # --- Panel principal: información del track ---
     st.header("🧭 Información del track original")
-    meta = get_gpx_metadata(gpx, df)
+    meta = get_gpx_metadata(trk, df)
     meta["Archivo original"] = uploaded_file.name
     meta_df = pd.DataFrame([meta]).T
     meta_df.columns = ['Valor']
@@ -393,14 +393,105 @@ if uploaded_file:
     st.subheader("💾 Exportar GPX recortado")
     base_name = os.path.splitext(uploaded_file.name)[0] if uploaded_file else "recorte-maxsail"
     file_name = st.text_input("Nombre del archivo a guardar (sin extensión)", value=f"{base_name}-recorte")
+    modo_remuestreo = st.selectbox("Remuestreo", ["Sin remuestreo", "1 Hz", "2 Hz", "Cada N metros"])
+    resample_kwargs = {}
+    if modo_remuestreo != "Sin remuestreo":
+        if modo_remuestreo == "Cada N metros":
+            resample_kwargs["every_m"] = st.number_input("Metros entre puntos", min_value=1, max_value=500, value=10, step=1)
+        else:
+            resample_kwargs["hz"] = 1 if modo_remuestreo == "1 Hz" else 2
+        resample_kwargs["interpolar"] = st.radio(
+            "Método", ["Interpolar", "Diezmar"], horizontal=True
+        ) == "Interpolar"
+        if resample_kwargs["interpolar"]:
+            resample_kwargs["max_gap_s"] = st.number_input(
+                "No interpolar en huecos de más de (s)", min_value=1, max_value=600, value=10, step=1
+            )
+    conservar_xml = gpx_index is not None and not resample_kwargs and st.checkbox(
+        "Conservar el XML original (elevación, extensiones y metadatos)", value=True
+    )
+    canales_extra = [c for c in df_recorte.columns if c not in ("lat", "lon", "time", "minutes")]
+    incluir_ext = not conservar_xml and bool(canales_extra) and st.checkbox(
+        f"Incluir telemetría en <extensions> ({', '.join(canales_extra)})", value=True
+    )
     if not df_recorte.empty:
-        gpx_output = df_to_gpx(df_recorte)
+        gpx_output = None
+        if conservar_xml:
+            gpx_output = trim_gpx_bytes(
+                gpx_bytes, gpx_index, trk["time"],
+                df_recorte["time"].min().tz_convert(None),
+                df_recorte["time"].max().tz_convert(None),
+            )
+        if gpx_output is None:
+            df_export = resample_df(df_recorte, **resample_kwargs) if resample_kwargs else df_recorte
+            gpx_output = df_to_gpx(df_export, extensions=incluir_ext)
+            if resample_kwargs:
+                st.caption(
+                    f"Remuestreado: {len(df_export)} puntos (antes {len(df_recorte)}) · "
+                    f"{len(gpx_output) / 1024:.0f} KB"
+                )
         st.download_button(
             label="📥 Descargar archivo GPX",
             data=gpx_output,
             file_name=f"{file_name}.gpx",
             mime="application/gpx+xml"
         )
+
+    # --- División automática: huecos de grabación y periodos parados ---
+    st.subheader("🧩 División automática en segmentos")
+    with st.expander("Parámetros de detección"):
+        max_gap_s = st.number_input("Hueco máximo entre puntos (s)", min_value=5, max_value=3600, value=60, step=5)
+        stationary_kn = st.number_input("Velocidad de parado (kn)", min_value=0.1, max_value=5.0, value=1.0, step=0.1)
+        min_stationary_s = st.number_input("Tiempo mínimo parado (s)", min_value=10, max_value=3600, value=120, step=10)
+        min_segment_s = st.number_input("Duración mínima de un segmento (s)", min_value=10, max_value=7200, value=120, step=10)
+    segmentos = detect_track_segments(
+        df["lat"].to_numpy(), df["lon"].to_numpy(), df["time"].dt.tz_convert(None).to_numpy(),
+        max_gap_s=max_gap_s, stationary_kn=stationary_kn,
+        min_stationary_s=min_stationary_s, min_segment_s=min_segment_s,
+    )
+    if len(segmentos) == 0:
+        st.info("No se detectaron segmentos de navegación con estos parámetros.")
+    else:
+        colores = [[31, 119, 180], [255, 127, 14], [44, 160, 44], [214, 39, 40], [148, 103, 189], [140, 86, 75]]
+        coords = df[["lon", "lat"]].to_numpy()
+        tramos_seg, paths = [], []
+        for k, (i0, i1) in enumerate(segmentos):
+            nombre = f"Segmento {k + 1}"
+            t_ini, t_fin = df["time"].iloc[i0], df["time"].iloc[i1 - 1]
+            tramos_seg.append({"nombre": nombre, "utc_ini": t_ini.isoformat(), "utc_fin": t_fin.isoformat()})
+            paths.append({"path": coords[i0:i1].tolist(), "color": colores[k % len(colores)], "name": nombre})
+        st.dataframe(pd.DataFrame([
+            {
+                "Segmento": t["nombre"],
+                "Inicio": t["utc_ini"],
+                "Fin": t["utc_fin"],
+                "Duración": str(pd.Timestamp(t["utc_fin"]) - pd.Timestamp(t["utc_ini"])),
+                "Puntos": int(i1 - i0),
+            }
+            for t, (i0, i1) in zip(tramos_seg, segmentos)
+        ]), hide_index=True)
+        st.pydeck_chart(pdk.Deck(
+            map_style=map_style,
+            initial_view_state=pdk.ViewState(latitude=df["lat"].mean(), longitude=df["lon"].mean(), zoom=12, pitch=0),
+            layers=[pdk.Layer(
+                "PathLayer",
+                data=paths,
+                get_path="path",
+                get_color="color",
+                width_min_pixels=3,
+                pickable=True,
+            )],
+            tooltip={"text": "{name}"},
+        ))
+        zip_seg = io.BytesIO()
+        with zipfile.ZipFile(zip_seg, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            tramos_to_zip(zf, uploaded_file.name, trk, tramos_seg, gpx_bytes)
+        st.download_button(
+            label=f"📥 Descargar {len(segmentos)} segmentos (zip)",
+            data=zip_seg.getvalue(),
+            file_name=f"{base_name}-segmentos.zip",
+            mime="application/zip",
+        )
 else:
     st.info("Sube un archivo GPX, VKX o FIT para comenzar.")
 
@@ -4,7 +4,8 @@ import io
 import streamlit as st
 import pandas as pd
 import pydeck as pdk
-import gpxpy
+
+from utils import read_gpx_arrays, gpx_time_warning
 
 # --------- MAPTILER CONFIG ---------
 MAPTILER_KEY = "1TpHMPPswY7nGJWlOXjY"
@@ -69,24 +70,21 @@ if not gpx_file:
 
 
 @st.cache_data(show_spinner=False)
-def gpx_to_df_bytes(content: bytes) -> pd.DataFrame:
-    gpx = gpxpy.parse(content.decode("utf-8", errors="ignore"))
-    data = []
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for pt in segment.points:
-                data.append(
-                    {
-                        "Lat": pt.latitude,
-                        "Lon": pt.longitude,
-                        "UTC": pd.to_datetime(pt.time) if pt.time else None,
-                    }
-                )
+def gpx_to_df_bytes(content: bytes, file_name: str = "") -> pd.DataFrame:
+    trk = read_gpx_arrays(content)
+    aviso = gpx_time_warning(trk, file_name)
+    if aviso:
+        st.warning(aviso)
+    data = {
+        "Lat": trk["lat"],
+        "Lon": trk["lon"],
+        "UTC": pd.Series(trk["time"]).dt.tz_localize("UTC"),
+    }
     df = pd.DataFrame(data).dropna(subset=["UTC"]).reset_index(drop=True)
     return df
 
 
-df = gpx_to_df_bytes(gpx_file.getvalue())
+df = gpx_to_df_bytes(gpx_file.getvalue(), gpx_file.name)
 if df.empty:
     st.error("El archivo GPX no tiene puntos con UTC.")
     st.stop()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Los módulos del repo (utils.py) viven en la raíz, sin paquete instalable
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
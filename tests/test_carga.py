@@ -0,0 +1,95 @@
+"""Carga multi-archivo con caché (utils.load_tracks_cached)."""
+import os
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import utils
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EJEMPLOS = [
+    "2025-06-21-ESP29375-P01.gpx",
+    "2025-06-21-ESP30782-P01.gpx",
+    "2025-06-21-ESP29375-P02.gpx",
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia(monkeypatch, tmp_path):
+    """Cada test con caché en memoria vacía y su propio almacén en disco."""
+    monkeypatch.setattr(utils, "TRACK_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "_track_cache", OrderedDict())
+    monkeypatch.setattr(utils, "_track_cache_bytes", 0)
+
+
+def _archivos():
+    archivos = []
+    for nombre in EJEMPLOS:
+        with open(os.path.join(RAIZ, nombre), "rb") as f:
+            archivos.append((f.read(), nombre))
+    archivos.insert(1, (b"<gpx><trk>", "roto.gpx"))
+    return archivos
+
+
+def _comprobar(resultados, archivos):
+    assert len(resultados) == len(archivos)
+    for (df, aviso), (_, nombre) in zip(resultados, archivos):
+        if nombre == "roto.gpx":
+            assert df.empty and aviso.startswith("No se pudo leer roto.gpx")
+        else:
+            assert aviso is None
+            assert (df["SourceFile"] == nombre).all()
+            esperado, _ = utils.parse_track_bytes(dict((n, c) for c, n in archivos)[nombre], nombre)
+            assert len(df) == len(esperado)
+
+
+def test_carga_en_paralelo_mantiene_orden_y_avisos():
+    archivos = _archivos()
+    _comprobar(utils.load_tracks_cached(archivos, max_workers=2), archivos)
+    # Segunda carga desde la caché: mismo resultado y copias independientes
+    resultados = utils.load_tracks_cached(archivos)
+    _comprobar(resultados, archivos)
+    resultados[0][0]["Lat"] = 0.0
+    assert (utils.load_tracks_cached(archivos[:1])[0][0]["Lat"] != 0.0).all()
+
+
+def test_carga_en_serie_si_el_pool_falla(monkeypatch):
+    class PoolRoto:
+        def map(self, *args):
+            raise BrokenProcessPool("worker muerto")
+
+    monkeypatch.setattr(utils, "_track_parse_pool", lambda *args: PoolRoto())
+    monkeypatch.setattr(utils, "_track_pool", PoolRoto())
+    archivos = _archivos()
+    _comprobar(utils.load_tracks_cached(archivos), archivos)
+    assert utils._track_pool is None
+
+
+# --- Etiqueta del almacén en disco ---
+@pytest.fixture
+def esquema_limpio():
+    utils.track_store_schema.cache_clear()
+    yield
+    utils.track_store_schema.cache_clear()
+
+
+def test_esquema_del_almacen_incluye_derivadas_y_heel(esquema_limpio):
+    columnas = dict(utils.track_store_schema())
+    for col in ("Dist", "COG", "SOG", "SOGS", "TWA", "VMG", "HEEL"):
+        assert col in columnas
+    assert columnas["HEEL"] == "float32"
+
+
+def test_etiqueta_cambia_con_el_esquema(monkeypatch, esquema_limpio):
+    contenido, nombre = _archivos()[0]
+    utils.load_tracks_cached([(contenido, nombre)])
+    content_hash = utils.track_content_hash(contenido)
+    etiqueta = utils.track_store_tag()
+    assert utils.load_track_store(content_hash, nombre) is not None
+
+    # Otra normalización (HEEL y VMG en float64): otra etiqueta y el archivo guardado no se usa
+    monkeypatch.setattr(utils, "TRACK_FLOAT32_COLUMNS", ("COG", "SOG", "SOGS", "TWA"))
+    utils.track_store_schema.cache_clear()
+    assert utils.track_store_tag() != etiqueta
+    assert utils.load_track_store(content_hash, nombre) is None
@@ -0,0 +1,80 @@
+"""Separación entre barcos sobre el peldaño perpendicular al viento."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+
+
+def test_ladder_distance_rung_escalar_y_array():
+    # Viento del norte: el peldaño es el eje Este-Oeste; 0.001° de longitud a 39.4° N ≈ 86 m
+    d = utils.ladder_distance_rung(39.4, -0.3, 39.4, -0.299, 0)
+    assert isinstance(d, float)
+    assert d == pytest.approx(-86.1, abs=0.5)
+    # 111 m a lo largo del viento apenas cuentan (solo la convergencia de la cuadrícula UTM)
+    assert utils.ladder_distance_rung(39.4, -0.3, 39.401, -0.3, 0) == pytest.approx(0, abs=5)
+    arr = utils.ladder_distance_rung(
+        np.full(3, 39.4), np.full(3, -0.3), np.full(3, 39.4), np.array([-0.3, -0.299, -0.301]), 0
+    )
+    np.testing.assert_allclose(arr, [0, -86.1, 86.1], atol=0.5)
+
+
+def test_utm_epsg():
+    assert utils.utm_epsg(39.4, -0.3) == 32630
+    assert utils.utm_epsg(-33.9, 18.4) == 32734
+
+
+def test_separacion_sin_puntos():
+    vacio = np.array([])
+    assert utils.ladder_distance_rung(vacio, vacio, vacio, vacio, 0).size == 0
+    matriz = utils.fleet_separation_matrix(np.empty((0, 3)), np.empty((0, 3)), 0)
+    assert matriz["eje"].shape == (0, 3, 3)
+
+
+def _flota():
+    """3 instantes de 4 barcos alrededor de 39.4 N, 0.3 W y un TWD por instante."""
+    rng = np.random.default_rng(7)
+    lats = 39.4 + rng.uniform(-0.005, 0.005, (3, 4))
+    lons = -0.3 + rng.uniform(-0.005, 0.005, (3, 4))
+    return lats, lons, np.array([10.0, 355.0, 180.0])
+
+
+def test_fleet_separation_matrix_igual_que_escalar():
+    lats, lons, twd = _flota()
+    matriz = utils.fleet_separation_matrix(lats, lons, twd)
+    assert matriz["eje"].shape == matriz["peldaño"].shape == (3, 4, 4)
+    epsg = utils.utm_epsg(lats, lons)
+    for k in range(3):
+        for i in range(4):
+            for j in range(4):
+                args = (lats[k, i], lons[k, i], lats[k, j], lons[k, j], twd[k])
+                assert matriz["eje"][k, i, j] == pytest.approx(utils.distance_on_axis(*args), abs=1e-6)
+                assert matriz["peldaño"][k, i, j] == pytest.approx(
+                    utils.ladder_distance_rung(*args, epsg=epsg), abs=1e-6
+                )
+    # Un solo instante (n,) con TWD escalar
+    una = utils.fleet_separation_matrix(lats[1], lons[1], twd[1])
+    np.testing.assert_allclose(una["peldaño"], matriz["peldaño"][1], atol=1e-6)
+    np.testing.assert_allclose(una["eje"], matriz["eje"][1], atol=1e-6)
+
+
+def test_pair_separation_series_igual_que_escalar():
+    utc = pd.date_range("2025-06-21 11:00:00", periods=20, freq="s")
+    df1 = pd.DataFrame({"UTC": utc, "Lat": 39.4 + np.arange(20) * 2e-5, "Lon": -0.3})
+    # Barco 2 desfasado 0.4 s y sin datos en los últimos 5 s
+    df2 = pd.DataFrame({
+        "UTC": utc[:15] + pd.Timedelta(milliseconds=400),
+        "Lat": 39.4005 + np.arange(15) * 2e-5,
+        "Lon": -0.2995 + np.arange(15) * 1e-5,
+    })
+    twd = np.linspace(0, 30, 20)
+    par = utils.pair_separation_series(df1, df2, twd, tolerance_s=2)
+    # Los 15 puntos con pareja y los 2 siguientes, aún a menos de tolerance_s del último
+    assert len(par) == 17
+    epsg = utils.utm_epsg(par["Lat1"], par["Lon1"])
+    for k, fila in par.iterrows():
+        j = min(k, 14)
+        assert (fila["Lat2"], fila["Lon2"]) == (df2["Lat"][j], df2["Lon"][j])
+        args = (fila["Lat1"], fila["Lon1"], fila["Lat2"], fila["Lon2"], twd[k])
+        assert fila["Dist_Eje"] == pytest.approx(utils.distance_on_axis(*args), abs=1e-6)
+        assert fila["Dist_Peldaño"] == pytest.approx(utils.ladder_distance_rung(*args, epsg=epsg), abs=1e-6)
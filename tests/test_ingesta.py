@@ -0,0 +1,72 @@
+"""Ingesta por lotes (maxsail-batch-ingest.py) y su index.json."""
+import importlib.util
+import json
+import os
+import shutil
+
+import pytest
+
+import utils
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_spec = importlib.util.spec_from_file_location("batch_ingest", os.path.join(RAIZ, "maxsail-batch-ingest.py"))
+batch_ingest = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(batch_ingest)
+
+pytestmark = pytest.mark.skipif(utils.feather is None, reason="el almacén requiere pyarrow")
+
+
+def _carpeta(tmp_path, nombre, archivos):
+    carpeta = tmp_path / nombre
+    carpeta.mkdir()
+    for origen, destino in archivos:
+        if isinstance(origen, bytes):
+            (carpeta / destino).write_bytes(origen)
+        else:
+            shutil.copy(os.path.join(RAIZ, origen), carpeta / destino)
+    return carpeta
+
+
+def _indice(store):
+    with open(utils.track_store_index_path(str(store)), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_ingesta_separa_errores_y_acumula(tmp_path):
+    store = tmp_path / "store"
+    regata = _carpeta(tmp_path, "regata", [
+        ("2025-06-21-ESP30782-P01.gpx", "2025-06-21-ESP30782-P01.gpx"),
+        ("2025-06-21-ESP30782-P01-meta-data.json", "2025-06-21-ESP30782-P01-meta-data.json"),
+        (b"<gpx><trk>", "roto.gpx"),
+    ])
+    assert batch_ingest.main([str(regata), "--store", str(store), "--workers", "1"]) == 0
+    indice = _indice(store)
+    assert [s["archivo"] for s in indice["sesiones"]] == ["2025-06-21-ESP30782-P01.gpx"]
+    sesion = indice["sesiones"][0]
+    assert sesion["estado"] == "ok" and sesion["aviso"] is None and sesion["puntos"] > 0
+    assert sesion["meta"]["ARCHIVO_TRACK"]
+    assert [(e["archivo"], e["estado"]) for e in indice["errores"]] == [("roto.gpx", "error")]
+    assert indice["errores"][0]["aviso"].startswith("No se pudo leer roto.gpx")
+
+    # Otra carpeta: se añaden sus sesiones sin perder las anteriores
+    entreno = _carpeta(tmp_path, "entreno", [("2025-06-21-ESP29375-P01.gpx", "P01.gpx")])
+    assert batch_ingest.main([str(entreno), "--store", str(store), "--workers", "1"]) == 0
+    indice = _indice(store)
+    assert sorted(s["archivo"] for s in indice["sesiones"]) == ["2025-06-21-ESP30782-P01.gpx", "P01.gpx"]
+    assert indice["errores"] == []
+
+
+def test_cargar_indice_descarta_entradas_fallidas(tmp_path):
+    ruta = tmp_path / "index.json"
+    ruta.write_text(json.dumps({
+        "tag": utils.track_store_tag(),
+        "sesiones": [
+            {"hash": "a", "archivo": "bueno.gpx", "puntos": 10, "aviso": None},
+            {"hash": "b", "archivo": "roto.gpx", "puntos": 0, "aviso": "No se pudo leer roto.gpx"},
+            {"hash": "c", "archivo": "x.gpx", "estado": "error", "puntos": 0, "aviso": "..."},
+        ],
+    }), encoding="utf-8")
+    assert list(batch_ingest.cargar_indice(str(ruta))) == ["a"]
+    ruta.write_text(json.dumps({"tag": "otra", "sesiones": [{"hash": "a", "puntos": 1}]}), encoding="utf-8")
+    assert batch_ingest.cargar_indice(str(ruta)) == {}
@@ -0,0 +1,365 @@
+"""Lectores vectorizados (GPX, VKX, CSV Vakaros) contra archivos de ejemplo y casos límite."""
+import io
+import os
+import struct
+import zipfile
+
+import gpxpy
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GPX_EJEMPLO = os.path.join(RAIZ, "2025-06-21-ESP29375-P01.gpx")
+
+
+def _gpx(puntos):
+    """GPX mínimo a partir de (lat, lon, time) con time como texto."""
+    trkpts = "".join(
+        f'<trkpt lat="{lat}" lon="{lon}"><time>{t}</time></trkpt>' for lat, lon, t in puntos
+    )
+    return (
+        '<?xml version="1.0"?><gpx version="1.1" creator="test" '
+        'xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+        f"{trkpts}</trkseg></trk></gpx>"
+    ).encode()
+
+
+T0_MS = 1_750_504_714_000  # 2025-06-21 11:18:34 UTC
+
+
+def _vkx_pos(ts_ms, lat, lon, sog_mps=3.0, cog_deg=0.0):
+    """Fila 0x02 del VKX (posición, SOG, COG y cuaternio identidad)."""
+    return b"\x02" + struct.pack(
+        "<Qii7f", ts_ms, round(lat * 1e7), round(lon * 1e7),
+        sog_mps, np.radians(cog_deg), 1.5, 1.0, 0.0, 0.0, 0.0,
+    )
+
+
+# --- GPX ---
+@pytest.fixture(scope="module")
+def gpx_ejemplo():
+    with open(GPX_EJEMPLO, "rb") as f:
+        return f.read()
+
+
+def test_gpx_ejemplo_arrays(gpx_ejemplo):
+    trk = utils.read_gpx_arrays(gpx_ejemplo)
+    assert trk["lat"].size == 1913
+    assert trk["sin_hora"] == 0
+    assert trk["creator"] == "Garmin Connect"
+    assert (trk["tracks"], trk["segments"]) == (1, 1)
+    assert trk["time"][0] == np.datetime64("2025-06-21T11:18:34")
+    assert trk["time"][-1] == np.datetime64("2025-06-21T11:50:31")
+
+
+def test_gpx_rapido_igual_que_gpxpy(gpx_ejemplo):
+    rapido = utils.read_gpx_arrays(gpx_ejemplo)
+    lento = utils.gpx_to_arrays(gpxpy.parse(gpx_ejemplo.decode("utf-8")))
+    for clave in ("lat", "lon", "time"):
+        np.testing.assert_array_equal(rapido[clave], lento[clave])
+
+
+def test_gpx_ejemplo_df(gpx_ejemplo):
+    df, aviso = utils.parse_track_bytes(gpx_ejemplo, "P01.gpx")
+    assert aviso is None
+    assert len(df) == 1912
+    assert df["UTC"].is_monotonic_increasing
+    primera, ultima = df.iloc[0], df.iloc[-1]
+    assert primera["UTC"] == pd.Timestamp("2025-06-21 11:18:35")
+    assert ultima["UTC"] == pd.Timestamp("2025-06-21 11:50:31")
+    assert primera["Lat"] == pytest.approx(39.407726, abs=1e-6)
+    assert primera["Lon"] == pytest.approx(-0.323376, abs=1e-6)
+    assert primera["COG"] == pytest.approx(236.0)
+    assert primera["SOG"] == pytest.approx(6.99)
+    assert ultima["COG"] == pytest.approx(198.0)
+    assert ultima["SOG"] == pytest.approx(4.79)
+    assert (df["SourceFile"] == "P01.gpx").all()
+
+
+def test_gpx_vacio():
+    trk = utils.read_gpx_arrays(_gpx([]))
+    assert trk["lat"].size == 0
+    df, aviso = utils.parse_track_bytes(_gpx([]), "vacio.gpx")
+    assert df.empty and aviso is None
+
+
+def test_gpx_un_punto():
+    contenido = _gpx([(39.4, -0.3, "2025-06-21T11:00:00Z")])
+    assert utils.read_gpx_arrays(contenido)["lat"].size == 1
+    df, _ = utils.parse_track_bytes(contenido, "uno.gpx")
+    assert df.empty
+
+
+def test_gpx_offset_a_utc():
+    contenido = _gpx([
+        (39.4, -0.3, "2025-06-21T13:00:00+02:00"),
+        (39.4001, -0.3, "2025-06-21T11:00:01Z"),
+    ])
+    np.testing.assert_array_equal(
+        utils.read_gpx_arrays(contenido)["time"],
+        np.array(["2025-06-21T11:00:00", "2025-06-21T11:00:01"], dtype="datetime64[ns]"),
+    )
+
+
+def test_gpx_hora_invalida():
+    contenido = _gpx([
+        (39.4, -0.3, "2025-06-21T11:00:00Z"),
+        (39.4001, -0.3, "no-es-una-hora"),
+        (39.4002, -0.3, "2025-06-21T11:00:02Z"),
+        (39.4003, -0.3, "2025-06-21T11:00:03Z"),
+    ])
+    trk = utils.read_gpx_arrays(contenido)
+    assert trk["sin_hora"] == 1 and np.isnat(trk["time"][1])
+    df, aviso = utils.parse_track_bytes(contenido, "mal.gpx")
+    assert "1 de 4" in aviso
+    assert df["UTC"].notna().all() and len(df) == 2
+
+
+def test_gpx_sin_ninguna_hora():
+    contenido = _gpx([(39.4, -0.3, "x"), (39.4001, -0.3, "y")])
+    df, aviso = utils.parse_track_bytes(contenido, "mal.gpx")
+    assert df.empty
+    assert "ningún <time>" in aviso
+
+
+def test_gpx_corrupto_no_lanza():
+    df, aviso = utils.parse_track_safe(b"<gpx><trk>", "roto.gpx")
+    assert df.empty
+    assert aviso.startswith("No se pudo leer roto.gpx")
+
+
+# --- VKX ---
+def test_vkx_posiciones_ordenadas():
+    contenido = (
+        b"\xff" + bytes(7)
+        + _vkx_pos(T0_MS, 39.4, -0.3, cog_deg=358)
+        + _vkx_pos(T0_MS + 2000, 39.4002, -0.3, cog_deg=2)
+        + _vkx_pos(T0_MS + 1000, 39.4001, -0.3, cog_deg=0)
+        + b"\x02\x00\x00"  # fila truncada al final: se ignora
+    )
+    trk = utils.read_vkx_arrays(contenido)
+    np.testing.assert_array_equal(
+        trk["time"],
+        np.datetime64("2025-06-21T11:18:34") + np.arange(3) * np.timedelta64(1, "s"),
+    )
+    np.testing.assert_allclose(trk["lat"], [39.4, 39.4001, 39.4002])
+    np.testing.assert_allclose(trk["ext"]["course"], [358, 0, 2], atol=1e-4)
+
+    df, aviso = utils.parse_track_bytes(contenido, "P01.vkx")
+    assert aviso is None
+    assert len(df) == 2
+    np.testing.assert_allclose(df["SOG"], 3.0 * utils.MPS_TO_KNOTS, atol=0.01)
+    np.testing.assert_allclose(df["COG"], [0, 2], atol=1e-4)
+    assert (df["HEEL"] == 0).all()
+
+
+@pytest.mark.parametrize("contenido", [b"", b"\xff" + bytes(7), _vkx_pos(T0_MS, 39.4, -0.3)])
+def test_vkx_vacio_o_un_punto(contenido):
+    df, aviso = utils.parse_track_bytes(contenido, "corto.vkx")
+    assert df.empty and aviso is None
+
+
+def test_vkx_canales():
+    contenido = (
+        b"\xff" + bytes(7)
+        + _vkx_pos(T0_MS, 39.4, -0.3)
+        + b"\x0a" + struct.pack("<Qff", T0_MS + 500, np.pi / 2, 5.0)
+        + b"\x08" + struct.pack("<Q5B", T0_MS + 700, 1, 2, 3, 4, 5)
+        + b"\x0c" + struct.pack("<Qf", T0_MS + 900, 7.5)
+    )
+    canales = utils.read_vkx_channels(contenido)
+    assert set(canales) == {"position", "wind", "device_config", "depth"}
+    assert canales["wind"]["direction_rad"][0] == pytest.approx(np.pi / 2)
+    assert canales["wind"]["time"][0] == np.datetime64("2025-06-21T11:18:34.500")
+    np.testing.assert_array_equal(canales["device_config"]["raw"], [[1, 2, 3, 4, 5]])
+    assert canales["depth"]["depth_m"][0] == pytest.approx(7.5)
+    assert canales["position"]["roll_deg"][0] == pytest.approx(0.0)
+
+
+# --- CSV Vakaros ---
+VAKAROS_CABECERA = b"timestamp,latitude,longitude,sog_kts,cog,hdg_true,heel,trim\n"
+
+
+def test_vakaros_csv():
+    contenido = VAKAROS_CABECERA + (
+        b"2025-06-21T13:00:02+02:00,39.4002,-0.3,6.1,2.0,1,5,0\n"
+        b"2025-06-21T11:00:00Z,39.4,-0.3,6.0,358.0,1,5,0\n"
+        b"2025-06-21T11:00:01Z,39.4001,-0.3,x,0.0,1,5,0\n"
+    )
+    df, aviso = utils.parse_track_bytes(contenido, "v.csv")
+    assert aviso is None
+    assert list(df["UTC"]) == list(pd.date_range("2025-06-21 11:00:00", periods=3, freq="s"))
+    np.testing.assert_allclose(df["COG"], [358, 0, 2])
+    assert np.isnan(df["SOG"].iloc[1]) and df["SOGS"].iloc[2] == pytest.approx(6.1)
+    # 0.0001° de latitud ≈ 11.12 m
+    np.testing.assert_allclose(df["Dist"], [0.0, 11.1195, 11.1195], atol=1e-3)
+    assert (df["SourceFile"] == "v.csv").all()
+
+
+def test_vakaros_csv_vacio():
+    df, aviso = utils.parse_track_bytes(VAKAROS_CABECERA, "v.csv")
+    assert df.empty and aviso is None
+    assert {"UTC", "Lat", "Lon", "Dist"} <= set(df.columns)
+
+
+def test_csv_sin_columnas():
+    df, aviso = utils.parse_track_bytes(b"a,b\n1,2\n", "otro.csv")
+    assert df.empty
+    assert aviso == "El archivo otro.csv no tiene columnas requeridas."
+
+
+def test_gpx_nombre_solo_del_trk():
+    contenido = _gpx([(39.4, -0.3, "2025-06-21T11:00:00Z")]).replace(
+        b"<trkseg>", b"<trkseg><trkpt lat=\"39.4001\" lon=\"-0.3\"><time>2025-06-21T11:00:01Z</time>"
+        b"<extensions><name>sensor</name></extensions></trkpt>"
+    ).replace(b"</trk>", b"<name>Regata</name></trk><wpt lat=\"1\" lon=\"1\"><name>Baliza</name></wpt>")
+    for extensiones in (False, True):
+        assert utils.read_gpx_arrays(contenido, extensions=extensiones)["name"] == "Regata"
+    sin_nombre = _gpx([(39.4, -0.3, "2025-06-21T11:00:00Z")]).replace(
+        b"</trk>", b"</trk><wpt lat=\"1\" lon=\"1\"><name>Baliza</name></wpt>"
+    )
+    assert utils.read_gpx_arrays(sin_nombre)["name"] is None
+
+
+def test_gpx_ejemplo_nombre_con_extensiones(gpx_ejemplo):
+    assert utils.read_gpx_arrays(gpx_ejemplo, extensions=True)["name"] == "Vela"
+
+
+def test_gpx_trkpt_sin_lat_pasa_a_gpxpy():
+    contenido = _gpx([(39.4, -0.3, "2025-06-21T11:00:00Z")]).replace(b'lat="39.4" ', b"")
+    # El lector rápido no lanza TypeError: recurre a gpxpy, que da un error legible
+    with pytest.raises(gpxpy.gpx.GPXException, match="latitude"):
+        utils.read_gpx_arrays(contenido)
+    df, aviso = utils.parse_track_safe(contenido, "sin-lat.gpx")
+    assert df.empty and aviso.startswith("No se pudo leer sin-lat.gpx")
+
+
+# --- Recorte GPX por rangos de bytes ---
+def test_recorte_conserva_el_xml(gpx_ejemplo):
+    trk = utils.read_gpx_arrays(gpx_ejemplo, extensions=True)
+    indice = utils.index_gpx_trkpts(gpx_ejemplo, trk["time"])
+    assert indice is not None
+    t_ini, t_fin = np.datetime64("2025-06-21T11:20:00"), np.datetime64("2025-06-21T11:25:00")
+    recorte = utils.trim_gpx_bytes(gpx_ejemplo, indice, trk["time"], t_ini, t_fin)
+
+    sel = (trk["time"] >= t_ini) & (trk["time"] <= t_fin)
+    i0, i1 = np.flatnonzero(sel)[[0, -1]]
+    inicios, fines = indice
+    # Cabecera, puntos y pie copiados byte a byte del original
+    assert recorte.startswith(gpx_ejemplo[:inicios[0]])
+    assert gpx_ejemplo[inicios[i0]:fines[i1]] in recorte
+    assert recorte.endswith(gpx_ejemplo[fines[-1]:])
+
+    releido = utils.read_gpx_arrays(recorte, extensions=True)
+    assert releido["lat"].size == sel.sum() == 301
+    assert releido["name"] == "Vela"
+    np.testing.assert_array_equal(releido["time"], trk["time"][sel])
+    np.testing.assert_array_equal(releido["ext"]["heart_rate"], trk["ext"]["heart_rate"][sel])
+
+
+def test_recorte_fuera_de_rango(gpx_ejemplo):
+    trk = utils.read_gpx_arrays(gpx_ejemplo)
+    indice = utils.index_gpx_trkpts(gpx_ejemplo, trk["time"])
+    assert utils.trim_gpx_bytes(
+        gpx_ejemplo, indice, trk["time"], np.datetime64("2025-06-22"), np.datetime64("2025-06-23")
+    ) is None
+
+
+@pytest.mark.parametrize("extra", [
+    b'<!-- <trkpt lat="1" lon="1"></trkpt> -->',
+    b'<desc><![CDATA[<trkpt lat="1" lon="1"></trkpt>]]></desc>',
+])
+def test_indice_no_cuadra(extra):
+    contenido = _gpx([
+        (39.4, -0.3, "2025-06-21T11:00:00Z"),
+        (39.4001, -0.3, "2025-06-21T11:00:01Z"),
+    ]).replace(b"<trkseg>", b"<trkseg>" + extra)
+    trk = utils.read_gpx_arrays(contenido)
+    assert trk["lat"].size == 2
+    assert utils.index_gpx_trkpts(contenido, trk["time"]) is None
+
+
+def test_indice_tiempos_desordenados_o_sin_hora():
+    desordenado = _gpx([
+        (39.4, -0.3, "2025-06-21T11:00:01Z"),
+        (39.4001, -0.3, "2025-06-21T11:00:00Z"),
+    ])
+    sin_hora = _gpx([(39.4, -0.3, "x"), (39.4001, -0.3, "2025-06-21T11:00:00Z")])
+    for contenido in (desordenado, sin_hora):
+        assert utils.index_gpx_trkpts(contenido, utils.read_gpx_arrays(contenido)["time"]) is None
+
+
+# --- Exportación de tramos a zip ---
+def test_export_tramos_zip(gpx_ejemplo):
+    vkx = b"\xff" + bytes(7) + b"".join(
+        _vkx_pos(T0_MS + k * 1000, 39.4 + k * 1e-5, -0.3) for k in range(600)
+    )
+    tramos = [
+        {"nombre": "Salida", "utc_ini": "2025-06-21T11:20:00", "utc_fin": "2025-06-21T11:22:00"},
+        {"nombre": "Ceñida 1", "utc_ini": "2025-06-21T11:25:00+00:00", "utc_fin": "2025-06-21T11:26:00+00:00"},
+        {"nombre": "", "utc_ini": "2025-06-22T10:00:00", "utc_fin": "2025-06-22T11:00:00"},
+    ]
+    buffer, resumen = utils.export_tramos_zip([("P01.gpx", gpx_ejemplo), ("P01.vkx", vkx)], tramos)
+    with zipfile.ZipFile(buffer) as zf:
+        entradas = [(info.filename, zf.read(info)) for info in zf.infolist()]
+
+    # Un GPX por tramo con puntos; el tramo vacío solo aparece en el resumen.
+    # El VKX tiene el mismo nombre base que el GPX: sus tramos llevan la extensión.
+    assert [e[0] for e in entradas] == [
+        "P01-01-Salida.gpx", "P01-02-Ceñida_1.gpx", "P01-vkx-01-Salida.gpx", "P01-vkx-02-Ceñida_1.gpx",
+    ]
+    assert [(r["Track"], r["Tramo"], r["Puntos"]) for r in resumen] == [
+        ("P01.gpx", "Salida", 121), ("P01.gpx", "Ceñida 1", 61), ("P01.gpx", "Tramo 3", 0),
+        ("P01.vkx", "Salida", 121), ("P01.vkx", "Ceñida 1", 61), ("P01.vkx", "Tramo 3", 0),
+    ]
+    for (_, data), tramo in zip(entradas, tramos[:2] * 2):
+        trk = utils.read_gpx_arrays(io.BytesIO(data))
+        assert trk["time"][0] == np.datetime64(tramo["utc_ini"][:19])
+        assert trk["time"][-1] == np.datetime64(tramo["utc_fin"][:19])
+
+
+# --- Escritura GPX ---
+def test_write_gpx_ida_y_vuelta():
+    n = 7
+    lat = 39.4 + np.arange(n) * 1.234567e-5
+    lon = -0.3 - np.arange(n) * 1e-5
+    time = np.datetime64("2025-06-21T11:00:00", "ns") + np.arange(n) * np.timedelta64(250, "ms")
+    ele = np.r_[np.arange(n - 1) * 1.5, np.nan]
+    ext = {
+        "heart_rate": np.array([90, 91, np.nan, 93, 94, 95, 96]),
+        "course": np.array([358, 359.5, 0, 1, 2, 3, 4]),
+        "heel": np.array([-12.5, -11, np.nan, np.nan, 3, 4, 5]),
+    }
+    buffer = utils.write_gpx(io.BytesIO(), lat, lon, time, ele=ele, ext=ext, name="Regata & co",
+                             chunk_size=3, segment_starts=[4])
+    trk = utils.read_gpx_arrays(buffer.getvalue(), extensions=True)
+    np.testing.assert_allclose(trk["lat"], lat, atol=1e-8)
+    np.testing.assert_allclose(trk["lon"], lon, atol=1e-8)
+    np.testing.assert_array_equal(trk["time"], time)
+    np.testing.assert_allclose(trk["ele"], ele, atol=0.005)
+    assert set(trk["ext"]) == set(ext)
+    for canal, valores in ext.items():
+        np.testing.assert_allclose(trk["ext"][canal], valores, atol=1e-4)
+    assert (trk["name"], trk["segments"], trk["ini_ultimo_segmento"]) == ("Regata & co", 2, 4)
+    assert trk["sin_hora"] == 0
+
+
+def test_write_gpx_sin_tiempos():
+    lat = np.array([39.4, 39.4001, 39.4002])
+    lon = np.full(3, -0.3)
+    for time in (np.full(3, np.datetime64("NaT"), dtype="datetime64[ns]"),
+                 np.array(["2025-06-21T11:00:00", "NaT", "2025-06-21T11:00:02"], dtype="datetime64[ns]")):
+        contenido = utils.write_gpx(io.BytesIO(), lat, lon, time).getvalue()
+        assert contenido.count(b"<time>") == (~np.isnat(time)).sum()
+        trk = utils.read_gpx_arrays(contenido)
+        np.testing.assert_array_equal(trk["time"], time)
+        np.testing.assert_allclose(trk["lat"], lat)
+        assert trk["sin_hora"] == np.isnat(time).sum()
+
+
+def test_write_gpx_vacio():
+    contenido = utils.write_gpx(io.BytesIO(), [], [], np.array([], dtype="datetime64[ns]")).getvalue()
+    assert utils.read_gpx_arrays(contenido)["lat"].size == 0
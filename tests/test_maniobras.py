@@ -0,0 +1,260 @@
+"""Detección de maniobras y ventanas temporales sobre tracks sintéticos."""
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import circmean
+
+import utils
+
+T0 = pd.Timestamp("2025-06-21 11:00:00")
+
+
+def _virada(track="A", n=120, giro=60, antes=340.0, despues=40.0):
+    """Track a 1 Hz con un cambio de COG de `antes` a `despues` en el punto `giro`."""
+    return pd.DataFrame({
+        "UTC": pd.date_range(T0, periods=n, freq="s"),
+        "COG": np.where(np.arange(n) < giro, antes, despues),
+        "Track": track,
+    })
+
+
+# --- Media circular móvil y detector por COG ---
+def test_rolling_circmean_igual_que_circmean():
+    rng = np.random.default_rng(0)
+    angulos = rng.uniform(0, 360, 200)
+    esperado = [circmean(angulos[k:k + 7], high=360, low=0) for k in range(200 - 6)]
+    diferencia = (utils.rolling_circmean_deg(angulos, 7) - esperado + 180) % 360 - 180
+    np.testing.assert_allclose(diferencia, 0, atol=1e-9)
+
+
+def test_rolling_circmean_cruza_el_norte_y_nan():
+    np.testing.assert_allclose(utils.rolling_circmean_deg([358, 2, 358, 2], 2) % 360, 0, atol=1e-9)
+    assert np.isnan(utils.rolling_circmean_deg([10, np.nan, 20], 2)).all()
+    assert utils.rolling_circmean_deg([], 3).size == 0
+    assert utils.rolling_circmean_deg([5], 3).size == 0
+
+
+def test_detectar_maniobra_cruzando_el_norte():
+    maniobras = utils.detectar_maniobras_cog(_virada(), umbral=30, window=10)
+    assert list(maniobras.columns) == ["UTC", "COG", "COG_previo", "COG_post", "Track", "idx", "pos"]
+    # Solo alrededor del giro; un promedio lineal (190°) daría candidatos en todo el track
+    assert maniobras["idx"].between(50, 70).all()
+    assert 59 in set(maniobras["idx"]) and 60 in set(maniobras["idx"])
+    fila = maniobras[maniobras["idx"] == 60].iloc[0]
+    assert fila["COG_previo"] == pytest.approx(340.0)
+    assert fila["COG_post"] == pytest.approx(40.0)
+
+
+def test_detectar_rumbo_estable_en_el_norte():
+    rng = np.random.default_rng(1)
+    df = _virada(n=200)
+    df["COG"] = np.mod(rng.uniform(-5, 5, len(df)), 360)
+    assert utils.detectar_maniobras_cog(df, umbral=30, window=10).empty
+
+
+def test_detectar_varios_tracks_desordenados():
+    df = pd.concat([_virada("A"), _virada("B", giro=80)]).sample(frac=1, random_state=2)
+    maniobras = utils.detectar_maniobras_cog(df, umbral=30, window=10)
+    assert set(maniobras["Track"]) == {"A", "B"}
+    # pos apunta a la fila de df que corresponde a cada maniobra
+    np.testing.assert_array_equal(df["UTC"].to_numpy()[maniobras["pos"]], maniobras["UTC"].to_numpy())
+    assert maniobras.loc[maniobras["Track"] == "B", "idx"].between(70, 90).all()
+
+
+@pytest.mark.parametrize("n", [0, 1, 20])
+def test_detectar_track_vacio_o_corto(n):
+    maniobras = utils.detectar_maniobras_cog(_virada(n=n, giro=n // 2), umbral=30, window=10)
+    assert maniobras.empty
+    assert "COG_previo" in maniobras.columns
+
+
+# --- Separación mínima entre maniobras ---
+def _filtrar_bucle(maniobra_df, tiempo_minimo):
+    """Referencia fila a fila: se conserva si dista >= tiempo_minimo de la última conservada."""
+    keep, ultima = [], {}
+    for i, fila in maniobra_df.sort_values(["Track", "UTC"]).iterrows():
+        previa = ultima.get(fila["Track"])
+        if previa is None or (fila["UTC"] - previa).total_seconds() >= tiempo_minimo:
+            keep.append(i)
+            ultima[fila["Track"]] = fila["UTC"]
+    return maniobra_df.loc[keep].reset_index(drop=True)
+
+
+def test_filtrar_maniobras_cercanas():
+    maniobras = pd.DataFrame({
+        "UTC": T0 + pd.to_timedelta([0, 5, 10, 12, 30, 3, 4, 40], unit="s"),
+        "Track": list("AAAAABBB"),
+    })
+    filtradas = utils.filtrar_maniobras_cercanas(maniobras.sample(frac=1, random_state=0), 10)
+    assert list(filtradas["Track"]) == list("AAABB")
+    assert list((filtradas["UTC"] - T0).dt.total_seconds()) == [0, 10, 30, 3, 40]
+
+
+def test_filtrar_igual_que_bucle():
+    rng = np.random.default_rng(3)
+    maniobras = pd.DataFrame({
+        "UTC": T0 + pd.to_timedelta(rng.integers(0, 600, 300), unit="s"),
+        "Track": rng.choice(["A", "B", "C"], 300),
+    })
+    pd.testing.assert_frame_equal(
+        utils.filtrar_maniobras_cercanas(maniobras, 15), _filtrar_bucle(maniobras, 15)
+    )
+
+
+@pytest.mark.parametrize("tiempo_minimo", [0, -5])
+def test_filtrar_sin_separacion_conserva_todas(tiempo_minimo):
+    maniobras = pd.DataFrame({
+        "UTC": T0 + pd.to_timedelta([0, 0, 1, 3], unit="s"),
+        "Track": "A",
+    })
+    assert len(utils.filtrar_maniobras_cercanas(maniobras, tiempo_minimo)) == 4
+
+
+def test_filtrar_vacio():
+    vacio = pd.DataFrame({"UTC": pd.Series(dtype="datetime64[ns]"), "Track": pd.Series(dtype=str)})
+    assert utils.filtrar_maniobras_cercanas(vacio, 10).empty
+
+
+# --- SOG alrededor de las maniobras ---
+def _sog_maniobra():
+    """1 Hz: 6 kn, baja a 3 kn entre los segundos 30 y 39 y vuelve a 6; NaN en el 45."""
+    utc = pd.date_range(T0, periods=60, freq="s")
+    sog = np.full(60, 6.0)
+    sog[30:40] = 3.0
+    sog[45] = np.nan
+    return utc, sog
+
+
+def test_velocidad_en_maniobras():
+    utc, sog = _sog_maniobra()
+    orden = np.random.default_rng(4).permutation(60)
+    r = utils.velocidad_en_maniobras(utc[orden], sog[orden], [utc[30], utc[5]], [-5, 0, 5, 10])
+    # [t-8, t]: ocho puntos a 6 kn y el de la maniobra a 3 kn
+    np.testing.assert_allclose(r["sog_previa"], [51 / 9, 6.0])
+    np.testing.assert_array_equal(r["recuperacion"], [10, 1])
+    np.testing.assert_allclose(r["medias"], [[5.5, 3.0, 3.0, 36 / 11], [6.0] * 4])
+
+
+def test_velocidad_sin_recuperacion_y_huecos():
+    utc, sog = _sog_maniobra()
+    # Sin datos entre los segundos 31 y 59: no hay recuperación ni medias tras la maniobra
+    r = utils.velocidad_en_maniobras(utc[:31], sog[:31], [utc[30]], [0, 5], t_post_max=20)
+    assert r["recuperacion"][0] == 21
+    np.testing.assert_allclose(r["medias"], [[3.0, 3.0]])
+    r = utils.velocidad_en_maniobras(utc[:31], sog[:31], [utc[30] + pd.Timedelta(seconds=15)], [0, -5])
+    assert np.isnan(r["medias"]).all() and np.isnan(r["sog_previa"]).all()
+
+
+def test_velocidad_vacio():
+    utc, sog = _sog_maniobra()
+    r = utils.velocidad_en_maniobras(utc, sog, utc[:0], [-5, 0, 5])
+    assert r["sog_previa"].size == 0 and r["medias"].shape == (0, 3)
+    r = utils.velocidad_en_maniobras(utc[:0], sog[:0], [utc[30]], [-5, 0, 5])
+    assert np.isnan(r["sog_previa"]).all() and np.isnan(r["medias"]).all()
+    assert r["recuperacion"][0] == 31
+
+
+# --- Ventanas extremas (sumas prefijas) ---
+SEG = 1_000_000_000
+
+
+def _ventanas_bucle(t_ns, valores, segmento, ventana_s):
+    """Referencia O(n²): media de cada ventana [t_i, t_i + ventana_s] que cabe en su segmento."""
+    medias = np.full(len(t_ns), np.nan)
+    for i in range(len(t_ns)):
+        mismo = segmento == segmento[i]
+        if segmento[i] < 0 or t_ns[mismo].max() < t_ns[i] + ventana_s * SEG:
+            continue
+        dentro = mismo & (t_ns >= t_ns[i]) & (t_ns <= t_ns[i] + ventana_s * SEG)
+        if not np.isnan(valores[dentro]).all():
+            medias[i] = np.nanmean(valores[dentro])
+    return medias
+
+
+def test_ventanas_extremas_top_k_sin_solape():
+    t = np.arange(10, dtype=np.int64) * SEG
+    v = np.array([1, 1, 5, 5, 1, 1, 4, 4, 1, 1], dtype=float)
+    medias, fin, extremos = utils.ventanas_extremas(t, v, np.zeros(10, int), 1, top_k=3)
+    np.testing.assert_allclose(medias, [1, 3, 5, 3, 1, 2.5, 4, 2.5, 1, np.nan])
+    np.testing.assert_array_equal(fin, [1, 2, 3, 4, 5, 6, 7, 8, 9, 9])
+    assert extremos == {"max": [2, 6, 0], "min": [0, 4, 8]}
+
+
+def test_ventanas_extremas_empates_y_nan():
+    t = np.arange(10, dtype=np.int64) * SEG
+    _, _, extremos = utils.ventanas_extremas(t, np.ones(10), np.zeros(10, int), 1, top_k=2)
+    # En empate gana la primera ventana
+    assert extremos == {"max": [0, 2], "min": [0, 2]}
+    v = np.array([1, 1, 5, np.nan, 1, 1, 4, 4, 1, 1])
+    medias, _, _ = utils.ventanas_extremas(t, v, np.zeros(10, int), 1)
+    assert medias[2] == pytest.approx(5.0) and medias[3] == pytest.approx(1.0)
+
+
+def test_ventanas_extremas_igual_que_bucle():
+    rng = np.random.default_rng(5)
+    t = np.cumsum(rng.integers(500, 1500, 400)) * 1_000_000
+    v = rng.normal(5, 2, 400)
+    v[rng.integers(0, 400, 20)] = np.nan
+    segmento = np.zeros(400, int)
+    medias, _, _ = utils.ventanas_extremas(t, v, segmento, 12)
+    np.testing.assert_allclose(medias, _ventanas_bucle(t, v, segmento, 12))
+
+
+@pytest.mark.parametrize("n", [0, 1])
+def test_ventanas_extremas_vacio_o_un_punto(n):
+    t = np.arange(n, dtype=np.int64) * SEG
+    medias, _, extremos = utils.ventanas_extremas(t, np.ones(n), np.zeros(n, int), 5)
+    assert np.isnan(medias).all()
+    assert extremos == {"max": [], "min": []}
+
+
+# --- Segmentos continuos y mejores / peores tramos por VMG ---
+def test_segmentos_continuos():
+    t = np.array([0, 1, 2, 3, 4, 20, 21, 22], dtype=np.int64) * SEG
+    mask = np.array([1, 1, 1, 0, 1, 1, 1, 1], dtype=bool)
+    np.testing.assert_array_equal(utils.segmentos_continuos(mask, t), [0, 0, 0, -1, 2, 2, 2, 2])
+    np.testing.assert_array_equal(utils.segmentos_continuos(mask, t, 10), [0, 0, 0, -1, 2, 3, 3, 3])
+    assert utils.segmentos_continuos(mask[:0], t[:0], 10).size == 0
+
+
+def _cenida():
+    """Ceñida a 1 Hz: 30 s, hueco de 70 s y otros 30 s; racha de VMG 9 y 3 s fuera de banda."""
+    segundos = np.r_[np.arange(30), np.arange(100, 130)]
+    df = pd.DataFrame({
+        "UTC": T0 + pd.to_timedelta(segundos, unit="s"),
+        "VMG": np.r_[np.full(30, 4.0), np.full(30, 5.0)],
+        "TWA": 40.0,
+        "Dist": 3.0,
+    })
+    df.loc[10:14, "VMG"] = 9.0
+    df.loc[20:22, "TWA"] = -100.0
+    return df
+
+
+def test_tramos_vmg_extremos():
+    df = _cenida()
+    extremos = utils.tramos_vmg_extremos(df.sample(frac=1, random_state=6), 10, (30, 60), top_k=2)
+    mejor, segundo = extremos["max"]
+    assert (mejor["i0"], mejor["i1"]) == (4, 14)
+    assert mejor["VMG"] == pytest.approx((5 * 9 + 6 * 4) / 11)
+    assert mejor["Dist"] == pytest.approx(33.0)
+    assert mejor["UTC_ini"] == T0 + pd.Timedelta(seconds=4)
+    assert mejor["TWA_ini"] == mejor["TWA_fin"] == 40.0
+    assert segundo["i0"] == 30 and segundo["VMG"] == pytest.approx(5.0)
+    assert [t["i0"] for t in extremos["min"]] == [0, 30]
+
+
+def test_tramos_no_cruzan_huecos():
+    df = _cenida()
+    # Con max_gap_s la racha 23-29 (7 s) no llega a 10 s; sin límite se "alarga" sobre el hueco
+    con_limite = utils.tramos_vmg_extremos(df, 10, (30, 60))
+    sin_limite = utils.tramos_vmg_extremos(df, 10, (30, 60), max_gap_s=None)
+    assert con_limite["min"][0]["i0"] == 0
+    assert sin_limite["min"][0]["i0"] == 23
+    for tramo in con_limite["max"] + con_limite["min"]:
+        assert tramo["UTC_fin"] - tramo["UTC_ini"] <= pd.Timedelta(seconds=10)
+
+
+@pytest.mark.parametrize("n", [0, 1])
+def test_tramos_vacio_o_un_punto(n):
+    assert utils.tramos_vmg_extremos(_cenida().iloc[:n], 10, (30, 60)) == {"max": [], "min": []}
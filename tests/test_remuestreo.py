@@ -0,0 +1,62 @@
+"""Remuestreo de tracks (utils.resample_track)."""
+import numpy as np
+import pytest
+
+import utils
+
+T0 = np.datetime64("2025-06-21T11:00:00", "ns")
+
+
+def _track(segundos, rumbos=None):
+    segundos = np.asarray(segundos, dtype=float)
+    lat = 39.4 + segundos * 1e-5
+    lon = np.full(segundos.size, -0.3)
+    time = T0 + (segundos * 1e9).astype("timedelta64[ns]")
+    ext = {"speed": segundos.copy()}
+    if rumbos is not None:
+        ext["course"] = np.asarray(rumbos, dtype=float)
+    return lat, lon, time, ext
+
+
+def test_interpolacion_a_2hz():
+    lat, lon, time, ext = _track([0, 1, 2])
+    lat2, _, time2, ext2 = utils.resample_track(lat, lon, time, ext, hz=2)
+    np.testing.assert_array_equal(time2, T0 + np.arange(5) * np.timedelta64(500, "ms"))
+    np.testing.assert_allclose(lat2, 39.4 + np.arange(5) * 0.5e-5)
+    np.testing.assert_allclose(ext2["speed"], [0, 0.5, 1, 1.5, 2])
+
+
+def test_rumbo_cruza_el_norte():
+    lat, lon, time, ext = _track([0, 1, 2], rumbos=[356, 358, 2])
+    _, _, _, ext2 = utils.resample_track(lat, lon, time, ext, hz=2)
+    diferencia = (ext2["course"] - np.array([356, 357, 358, 0, 2]) + 180) % 360 - 180
+    np.testing.assert_allclose(diferencia, 0, atol=1e-3)
+    assert ((ext2["course"] >= 0) & (ext2["course"] < 360)).all()
+
+
+def test_no_inventa_puntos_en_huecos():
+    # 3 s grabando, 10 minutos sin datos y otros 3 s
+    lat, lon, time, ext = _track([0, 1, 2, 602, 603, 604])
+    _, _, time2, _ = utils.resample_track(lat, lon, time, ext, hz=1)
+    np.testing.assert_array_equal(time2, time)
+    _, _, time2, _ = utils.resample_track(lat, lon, time, ext, every_m=5)
+    hueco = (time2 > T0 + np.timedelta64(2, "s")) & (time2 < T0 + np.timedelta64(602, "s"))
+    assert not hueco.any()
+    # Sin límite se rellena el hueco (comportamiento explícito)
+    _, _, time2, _ = utils.resample_track(lat, lon, time, ext, hz=1, max_gap_s=None)
+    assert time2.size == 605
+
+
+def test_diezmado_conserva_puntos_reales():
+    lat, lon, time, ext = _track(np.arange(0, 10, 0.25))
+    lat2, _, time2, ext2 = utils.resample_track(lat, lon, time, ext, hz=1, interpolar=False)
+    np.testing.assert_array_equal(time2, T0 + np.arange(10) * np.timedelta64(1, "s"))
+    assert np.isin(lat2, lat).all()
+    np.testing.assert_array_equal(ext2["speed"], np.arange(10.0))
+
+
+@pytest.mark.parametrize("segundos", [[], [0]])
+def test_vacio_o_un_punto(segundos):
+    lat, lon, time, ext = _track(segundos)
+    lat2, _, time2, _ = utils.resample_track(lat, lon, time, ext, hz=1)
+    assert lat2.size == time2.size == len(segundos)
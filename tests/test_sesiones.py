@@ -0,0 +1,106 @@
+"""División automática de sesiones y unión de varias grabaciones."""
+import numpy as np
+import pytest
+
+import utils
+
+T0 = np.datetime64("2025-06-21T11:00:00", "ns")
+PASO_5KN = 2.3e-5  # grados de latitud por segundo ≈ 2.56 m/s ≈ 5 kn
+
+
+def _track(pasos_lat, pasos_s):
+    """lat, lon, time a partir de los incrementos de latitud y de tiempo de cada paso."""
+    lat = 39.4 + np.concatenate(([0.0], np.cumsum(pasos_lat)))
+    segundos = np.concatenate(([0.0], np.cumsum(pasos_s)))
+    return lat, np.full(lat.size, -0.3), T0 + (segundos * 1e9).astype("timedelta64[ns]")
+
+
+# --- detect_track_segments ---
+def test_segmentos_sin_cortes():
+    segmentos = utils.detect_track_segments(*_track(np.full(599, PASO_5KN), np.ones(599)))
+    np.testing.assert_array_equal(segmentos, [[0, 600]])
+
+
+def test_segmentos_hueco_de_grabacion():
+    pasos_s = np.ones(599)
+    pasos_s[299] = 120  # dos minutos sin puntos entre el 299 y el 300, navegando
+    lat, lon, time = _track(PASO_5KN * pasos_s, pasos_s)
+    np.testing.assert_array_equal(utils.detect_track_segments(lat, lon, time), [[0, 300], [300, 600]])
+    # Con un umbral mayor que el hueco no se corta
+    np.testing.assert_array_equal(utils.detect_track_segments(lat, lon, time, max_gap_s=180), [[0, 600]])
+
+
+def test_segmentos_parado():
+    pasos_lat = np.full(799, PASO_5KN)
+    pasos_lat[300:500] = 0.0  # 200 s parado en el punto 300
+    lat, lon, time = _track(pasos_lat, np.ones(799))
+    np.testing.assert_array_equal(utils.detect_track_segments(lat, lon, time), [[0, 301], [500, 800]])
+    # Una parada más corta que min_stationary_s no corta la sesión
+    np.testing.assert_array_equal(
+        utils.detect_track_segments(lat, lon, time, min_stationary_s=300), [[0, 800]]
+    )
+    # Por debajo de stationary_kn cuenta como parado aunque se mueva
+    lento = _track(np.full(599, PASO_5KN / 10), np.ones(599))
+    assert utils.detect_track_segments(*lento).shape == (0, 2)
+    np.testing.assert_array_equal(utils.detect_track_segments(*lento, stationary_kn=0.4), [[0, 600]])
+
+
+def test_segmentos_cortos_se_descartan():
+    pasos_s = np.ones(599)
+    pasos_s[59] = 120
+    lat, lon, time = _track(np.full(599, PASO_5KN), pasos_s)
+    np.testing.assert_array_equal(utils.detect_track_segments(lat, lon, time), [[60, 600]])
+
+
+@pytest.mark.parametrize("n", [0, 1])
+def test_segmentos_vacio_o_un_punto(n):
+    lat, lon, time = _track(np.full(599, PASO_5KN), np.ones(599))
+    assert utils.detect_track_segments(lat[:n], lon[:n], time[:n]).shape == (0, 2)
+
+
+# --- merge_track_arrays ---
+def _grabacion(segundos, lat0, ext=None):
+    segundos = np.asarray(segundos, dtype=float)
+    return {
+        "lat": lat0 + segundos * 1e-5,
+        "lon": np.full(segundos.size, -0.3),
+        "ele": np.zeros(segundos.size),
+        "time": T0 + (segundos * 1e9).astype("timedelta64[ns]"),
+        "ext": ext or {},
+    }
+
+
+def test_union_intercalada_ordenada():
+    a = _grabacion([4, 0, 2], 39.4, {"heart_rate": np.array([94, 90, 92], dtype=np.float32)})
+    b = _grabacion([1, 3, 5], 39.5)
+    unido = utils.merge_track_arrays([a, b])
+    np.testing.assert_array_equal(unido["time"], T0 + np.arange(6) * np.timedelta64(1, "s"))
+    # Cada punto conserva su posición y sus canales (NaN donde el archivo no los trae)
+    np.testing.assert_allclose(unido["lat"] - np.where(np.arange(6) % 2, 39.5, 39.4), np.arange(6) * 1e-5)
+    np.testing.assert_array_equal(unido["ext"]["heart_rate"], [90, np.nan, 92, np.nan, 94, np.nan])
+    np.testing.assert_array_equal(unido["segment_starts"], [])
+    assert unido["duplicados"] == 0
+
+
+def test_union_duplicados_gana_el_primero():
+    a = _grabacion([0, 1, 2], 39.4)
+    b = _grabacion([1, 2, 3], 39.5)
+    unido = utils.merge_track_arrays([a, b])
+    np.testing.assert_array_equal(unido["time"], T0 + np.arange(4) * np.timedelta64(1, "s"))
+    np.testing.assert_allclose(unido["lat"], [39.4, 39.40001, 39.40002, 39.50003])
+    assert unido["duplicados"] == 2
+    # Con el orden de entrada al revés gana el otro archivo
+    np.testing.assert_allclose(utils.merge_track_arrays([b, a])["lat"], [39.4, 39.50001, 39.50002, 39.50003])
+
+
+def test_union_hueco_abre_segmento():
+    a = _grabacion([0, 1, 2], 39.4)
+    b = _grabacion([100, 101], 39.5)
+    np.testing.assert_array_equal(utils.merge_track_arrays([b, a])["segment_starts"], [3])
+    np.testing.assert_array_equal(utils.merge_track_arrays([a, b], max_gap_s=120)["segment_starts"], [])
+
+
+def test_union_vacia():
+    unido = utils.merge_track_arrays([_grabacion([], 39.4)])
+    assert unido["time"].size == 0 and unido["duplicados"] == 0
+    assert utils.merge_track_arrays([_grabacion([], 39.4), _grabacion([7], 39.5)])["time"].size == 1
@@ -1,12 +1,39 @@
 # utils.py
+import hashlib
+import io
 import math
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
 import pandas as pd
 import gpxpy
 import pyproj 
 import numpy as np
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from haversine import haversine
-from pyproj import Proj, Transformer
+from pyproj import Transformer
+
+# Optional FIT support (requires: pip install fitparse)
+try:
+    from fitparse import FitFile
+except Exception:
+    FitFile = None
+
+# Optional on-disk track store (requires: pip install pyarrow)
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except Exception:
+    pa = feather = None
 
 wgs84 = pyproj.Geod(ellps="WGS84")
 
@@ -87,6 +114,858 @@ def estimate_wind_direction(lat_start, lon_start, lat_end, lon_end):
     _, COG, _ = calculate_distance_bearing(lat_start, lon_start, lat_end, lon_end)
     return (COG + 180) % 360
 
+# --- Lectura GPX en streaming ---
+def _local_tag(tag):
+    """Nombre de etiqueta XML sin namespace ('{ns}trkpt' -> 'trkpt')."""
+    return tag.rpartition('}')[2]
+
+def _gpx_source_bytes(source):
+    """Devuelve el contenido GPX como bytes: acepta bytes, XML en str, ruta o file-like."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, str):
+        if source.lstrip().startswith("<"):
+            return source.encode("utf-8")
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "seek"):
+        source.seek(0)
+    data = source.read()
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+# Canales conocidos de <extensions>, por nombre local del elemento (en minúsculas).
+# Cubre Garmin TrackPointExtension v1/v2 (hr, cad, atemp, wtemp, depth, speed, course),
+# Garmin GpxExtensions v3 (Temperature, Depth) y gpxdata de Cluetrust (hr, cadence, temp).
+# Mismos nombres que los canales de FIT; las hojas desconocidas conservan su nombre.
+GPX_EXTENSION_CHANNELS = {
+    "hr": "heart_rate", "heartrate": "heart_rate",
+    "cad": "cadence", "cadence": "cadence",
+    "atemp": "temperature", "temp": "temperature", "temperature": "temperature",
+    "wtemp": "water_temperature",
+    "speed": "speed",
+    "course": "course",
+    "depth": "depth",
+    "power": "power",
+}
+
+def _extension_leaves(ext_elem):
+    """(canal, texto) de cada hoja con valor dentro de un elemento <extensions>,
+    incluidas las anidadas (p. ej. <gpxtpx:TrackPointExtension><gpxtpx:hr>).
+    """
+    for leaf in ext_elem.iter():
+        if len(leaf) == 0 and leaf.text and leaf.text.strip():
+            local = _local_tag(leaf.tag).lower()
+            yield GPX_EXTENSION_CHANNELS.get(local, local), leaf.text
+
+def _extension_arrays(ext, n):
+    """Convierte {canal: (índices, textos)} en arrays float32 de longitud n (NaN sin dato),
+    en bloque con pd.to_numeric. Se descartan los canales sin ningún valor numérico.
+    """
+    canales = {}
+    for name, (idx, textos) in ext.items():
+        valores = pd.to_numeric(pd.Series(textos, dtype=object), errors="coerce").to_numpy(np.float32)
+        if np.isnan(valores).all():
+            continue
+        arr = np.full(n, np.nan, dtype=np.float32)
+        arr[np.asarray(idx, dtype=np.int64)] = valores
+        canales[name] = arr
+    return canales
+
+def _utc_naive(values):
+    """Convierte textos/datetimes ISO 8601 a datetime64[ns] UTC naive.
+    Las horas con desfase (p. ej. +02:00) se pasan a UTC, igual que las terminadas en Z;
+    los textos sin zona se toman como UTC. Un <time> ausente o ilegible queda como NaT
+    (ver "sin_hora" en read_gpx_arrays).
+    """
+    tiempos = pd.to_datetime(pd.Series(values, dtype=object), utc=True, format="ISO8601", errors="coerce")
+    return tiempos.dt.tz_convert(None).to_numpy("datetime64[ns]")
+
+def gpx_to_arrays(gpx, extensions=False):
+    """Fallback con gpxpy: mismo diccionario que read_gpx_arrays a partir de un objeto GPX."""
+    lats, lons, eles, times = [], [], [], []
+    ext = {}
+    segments = 0
+    ini_ultimo_segmento = 0
+    for track in gpx.tracks:
+        for segment in track.segments:
+            segments += 1
+            if not segment.points:
+                continue
+            ini_ultimo_segmento = len(lats)
+            for point in segment.points:
+                if extensions:
+                    for e in point.extensions:
+                        for name, texto in _extension_leaves(e):
+                            idx, textos = ext.setdefault(name, ([], []))
+                            idx.append(len(lats))
+                            textos.append(texto)
+                lats.append(point.latitude)
+                lons.append(point.longitude)
+                eles.append(np.nan if point.elevation is None else point.elevation)
+                times.append(point.time)
+    times = _utc_naive(times)
+    return {
+        "lat": np.asarray(lats, dtype=np.float64),
+        "lon": np.asarray(lons, dtype=np.float64),
+        "ele": np.asarray(eles, dtype=np.float64),
+        "time": times,
+        "sin_hora": int(np.isnat(times).sum()),
+        "ext": _extension_arrays(ext, len(lats)),
+        "creator": gpx.creator,
+        "name": gpx.tracks[0].name if gpx.tracks else None,
+        "tracks": len(gpx.tracks),
+        "segments": segments,
+        "ini_ultimo_segmento": ini_ultimo_segmento,
+    }
+
+def read_gpx_arrays(source, extensions=False):
+    """Lee un GPX en streaming con iterparse, sin construir objetos gpxpy por punto.
+    Escribe lat/lon/ele directamente en arrays tipados preasignados y libera cada
+    <trkpt> tras leerlo. Con extensions=True guarda también los valores hoja de
+    <extensions> como arrays float32 (NaN si el punto no lo trae), con los nombres
+    de canal de GPX_EXTENSION_CHANNELS para los esquemas conocidos (Garmin TPX...).
+    Devuelve un dict: lat, lon, ele, time (datetime64[ns] UTC naive), sin_hora
+    (puntos sin <time> o con un <time> ilegible, que quedan como NaT), ext, creator,
+    name, tracks, segments, ini_ultimo_segmento.
+    Si el XML no se puede leer así (archivos raros), recurre a gpxpy.
+    """
+    data = _gpx_source_bytes(source)
+    try:
+        trk = _iterparse_gpx(data, extensions)
+    except (ET.ParseError, ValueError, TypeError):
+        # TypeError: <trkpt> sin lat/lon (float(None))
+        trk = None
+    if trk is None or (trk["lat"].size == 0 and b"trkpt" in data):
+        trk = gpx_to_arrays(gpxpy.parse(data.decode("utf-8", errors="ignore")), extensions)
+    return trk
+
+def _iterparse_gpx(data, extensions):
+    # Número de puntos: etiquetas de apertura <trkpt> (con o sin prefijo de espacio de nombres)
+    cap = len(_TRKPT_START.findall(data))
+    lats = np.empty(cap, dtype=np.float64)
+    lons = np.empty(cap, dtype=np.float64)
+    eles = np.full(cap, np.nan)
+    times = np.empty(cap, dtype=object)
+    ext = {}
+    n = 0
+    root = None
+    creator = name = None
+    tracks = segments = 0
+    padres = []  # etiquetas abiertas: <name> solo cuenta como hijo directo de <trk>
+    seg_elem = None
+    seg_ini = 0
+    ini_ultimo_segmento = 0
+    for event, elem in ET.iterparse(io.BytesIO(data), events=("start", "end")):
+        tag = _local_tag(elem.tag)
+        if event == "start":
+            padres.append(tag)
+            if root is None:
+                root = elem
+                creator = elem.get("creator")
+            elif tag == "trkseg":
+                seg_elem = elem
+                seg_ini = n
+                segments += 1
+            elif tag == "trk":
+                tracks += 1
+            continue
+        padres.pop()
+        if tag == "trkpt":
+            if n == cap:
+                raise ValueError("más <trkpt> de los contados")
+            lats[n] = float(elem.get("lat"))
+            lons[n] = float(elem.get("lon"))
+            times[n] = None
+            for child in elem:
+                ctag = _local_tag(child.tag)
+                if ctag == "time":
+                    times[n] = child.text
+                elif ctag == "ele" and child.text:
+                    eles[n] = float(child.text)
+                elif ctag == "extensions" and extensions:
+                    for canal, texto in _extension_leaves(child):
+                        idx, textos = ext.setdefault(canal, ([], []))
+                        idx.append(n)
+                        textos.append(texto)
+            n += 1
+            # Liberar el punto ya leído para no acumular el árbol en memoria
+            elem.clear()
+            if seg_elem is not None:
+                seg_elem.remove(elem)
+        elif tag == "trkseg":
+            if n > seg_ini:
+                ini_ultimo_segmento = seg_ini
+            seg_elem = None
+            elem.clear()
+        elif tag == "name" and name is None and padres and padres[-1] == "trk":
+            name = elem.text
+    times = _utc_naive(times[:n])
+    return {
+        "lat": lats[:n],
+        "lon": lons[:n],
+        "ele": eles[:n],
+        "time": times,
+        "sin_hora": int(np.isnat(times).sum()),
+        "ext": _extension_arrays(ext, n),
+        "creator": creator,
+        "name": name,
+        "tracks": tracks,
+        "segments": segments,
+        "ini_ultimo_segmento": ini_ultimo_segmento,
+    }
+
+# --- Lectura VKX (Vakaros) ---
+# Tamaño fijo del payload por clave de fila (bytes), según la especificación pública VKX v1.4.
+# Incluye las filas internas para poder saltarlas sin desalinear.
+VKX_ROW_SIZES = {
+    0xFF: 7, 0xFE: 2, 0x02: 44, 0x03: 20, 0x04: 13, 0x05: 17, 0x06: 18,
+    0x08: 13, 0x0A: 16, 0x0B: 16, 0x0C: 12, 0x0F: 16, 0x10: 12,
+    0x01: 32, 0x07: 12, 0x0E: 16, 0x20: 13, 0x21: 52,
+}
+
+# Filas públicas del VKX como dtypes estructurados (todas empiezan por el timestamp en ms).
+# La fila 0x08 (configuración del dispositivo) se decodifica con su timestamp y sus
+# 5 bytes de datos sin interpretar ("raw", uint8 (n, 5)): el visor no usa sus campos.
+VKX_ROW_DTYPES = {
+    # 0x02 posición, velocidad y orientación: <Q ii 7f
+    0x02: ("position", np.dtype([
+        ("ts_ms", "<u8"), ("lat_e7", "<i4"), ("lon_e7", "<i4"),
+        ("sog_mps", "<f4"), ("cog_rad", "<f4"), ("alt_m", "<f4"),
+        ("qw", "<f4"), ("qx", "<f4"), ("qy", "<f4"), ("qz", "<f4"),
+    ])),
+    0x03: ("declination", np.dtype([
+        ("ts_ms", "<u8"), ("declination_rad", "<f4"), ("lat_e7", "<i4"), ("lon_e7", "<i4"),
+    ])),
+    0x04: ("race_timer", np.dtype([("ts_ms", "<u8"), ("event", "u1"), ("timer_s", "<i4")])),
+    0x05: ("line_position", np.dtype([
+        ("ts_ms", "<u8"), ("line_type", "u1"), ("lat", "<f4"), ("lon", "<f4"),
+    ])),
+    0x06: ("shift_angle", np.dtype([
+        ("ts_ms", "<u8"), ("tack", "u1"), ("manual", "u1"), ("heading_rad", "<f4"), ("speed_mps", "<f4"),
+    ])),
+    0x08: ("device_config", np.dtype([("ts_ms", "<u8"), ("raw", "u1", (5,))])),
+    0x0A: ("wind", np.dtype([("ts_ms", "<u8"), ("direction_rad", "<f4"), ("speed_mps", "<f4")])),
+    0x0B: ("speed_through_water", np.dtype([
+        ("ts_ms", "<u8"), ("forward_mps", "<f4"), ("horizontal_mps", "<f4"),
+    ])),
+    0x0C: ("depth", np.dtype([("ts_ms", "<u8"), ("depth_m", "<f4")])),
+    0x0F: ("load", np.dtype([("ts_ms", "<u8"), ("sensor", "S4"), ("load_kgf", "<f4")])),
+    0x10: ("temperature", np.dtype([("ts_ms", "<u8"), ("temperature_c", "<f4")])),
+}
+VKX_POS_DTYPE = VKX_ROW_DTYPES[0x02][1]
+MPS_TO_KNOTS = 3600 / 1852
+
+def _vkx_row_offsets(data, keys=(0x02,)):
+    """Recorre una sola vez el encuadre clave+payload del VKX y devuelve,
+    para cada clave pedida, el array de offsets donde empieza su payload.
+    Se detiene en una clave desconocida o en una fila truncada (como el lector original).
+    """
+    sizes = [-1] * 256
+    for key, size in VKX_ROW_SIZES.items():
+        sizes[key] = size
+    offsets = {key: [] for key in keys}
+    pos, n = 0, len(data)
+    while pos < n:
+        key = data[pos]
+        size = sizes[key]
+        if size < 0 or pos + 1 + size > n:
+            break
+        lista = offsets.get(key)
+        if lista is not None:
+            lista.append(pos + 1)
+        pos += 1 + size
+    return {key: np.asarray(v, dtype=np.int64) for key, v in offsets.items()}
+
+def _vkx_rows(data, offsets, dtype):
+    """Decodifica en bloque los payloads que empiezan en `offsets` como array estructurado.
+    Las filas se copian desde una vista deslizante del buffer (sin copia): solo se reserva
+    el resultado, no una matriz de índices n × itemsize.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size < dtype.itemsize:
+        return np.empty(0, dtype=dtype)
+    filas = np.lib.stride_tricks.sliding_window_view(buf, dtype.itemsize)[offsets]
+    return filas.reshape(-1).view(dtype)
+
+def quaternion_to_euler_deg(qw, qx, qy, qz):
+    """Roll, pitch y yaw (grados) de cuaternios en bloque (convención Z-Y-X).
+    En la fila 0x02 del VKX el roll es la escora y el pitch el trimado.
+    """
+    qw, qx, qy, qz = (np.asarray(q, dtype=np.float64) for q in (qw, qx, qy, qz))
+    roll = np.arctan2(2 * (qw * qx + qy * qz), 1 - 2 * (qx * qx + qy * qy))
+    pitch = np.arcsin(np.clip(2 * (qw * qy - qz * qx), -1.0, 1.0))
+    yaw = np.arctan2(2 * (qw * qz + qx * qy), 1 - 2 * (qy * qy + qz * qz))
+    return np.degrees(roll), np.degrees(pitch), np.degrees(yaw)
+
+def read_vkx_channels(source):
+    """Decodifica todas las filas públicas de un VKX (VKX_ROW_DTYPES) en una sola pasada.
+
+    Devuelve {tipo: {campo: array}} por tipo de fila presente ('position', 'wind',
+    'speed_through_water', 'depth', 'load', 'device_config' (bytes sin interpretar)...),
+    cada uno ordenado por tiempo y con
+    su columna 'time' (datetime64[ns] UTC naive). Las coordenadas e7 se pasan a grados
+    y 'position' incluye roll_deg / pitch_deg / yaw_deg calculados del cuaternio.
+    """
+    data = _gpx_source_bytes(source)
+    offsets = _vkx_row_offsets(data, keys=tuple(VKX_ROW_DTYPES))
+    canales = {}
+    for key, (nombre, dtype) in VKX_ROW_DTYPES.items():
+        if offsets[key].size == 0:
+            continue
+        filas = _vkx_rows(data, offsets[key], dtype)
+        filas = filas[np.argsort(filas["ts_ms"], kind="stable")]
+        canal = {"time": filas["ts_ms"].astype(np.int64).astype("datetime64[ms]").astype("datetime64[ns]")}
+        for campo in dtype.names[1:]:
+            if campo.endswith("_e7"):
+                canal[campo[:-3]] = filas[campo] * 1e-7
+            elif campo == "sensor":
+                canal[campo] = np.char.decode(filas[campo], "ascii", "replace")
+            else:
+                canal[campo] = filas[campo].copy()
+        if nombre == "position":
+            canal["roll_deg"], canal["pitch_deg"], canal["yaw_deg"] = quaternion_to_euler_deg(
+                filas["qw"], filas["qx"], filas["qy"], filas["qz"]
+            )
+        canales[nombre] = canal
+    return canales
+
+def read_vkx_arrays(source, name=None):
+    """Lee las filas de posición (0x02) de un VKX de Vakaros directamente a arrays.
+
+    `source` puede ser bytes, ruta o file-like. Devuelve el mismo diccionario que
+    read_gpx_arrays (lat, lon, ele, time UTC naive...), ordenado por tiempo. En "ext"
+    van los canales del dispositivo: speed (m/s), course (°), heel y pitch (°).
+    """
+    data = _gpx_source_bytes(source)
+    pos = _vkx_rows(data, _vkx_row_offsets(data)[0x02], VKX_POS_DTYPE)
+    pos = pos[np.argsort(pos["ts_ms"], kind="stable")]
+    roll, pitch, _ = quaternion_to_euler_deg(pos["qw"], pos["qx"], pos["qy"], pos["qz"])
+    return {
+        "lat": pos["lat_e7"] * 1e-7,
+        "lon": pos["lon_e7"] * 1e-7,
+        "ele": pos["alt_m"].astype(np.float64),
+        "time": pos["ts_ms"].astype(np.int64).astype("datetime64[ms]").astype("datetime64[ns]"),
+        "ext": {
+            "speed": pos["sog_mps"].copy(),
+            "course": np.degrees(pos["cog_rad"]).astype(np.float32) % 360,
+            "heel": roll.astype(np.float32),
+            "pitch": pitch.astype(np.float32),
+        },
+        "creator": "Vakaros VKX",
+        "name": name,
+        "tracks": 1,
+        "segments": 1,
+        "ini_ultimo_segmento": 0,
+    }
+
+# --- Lectura FIT ---
+# Canales extra de los mensajes 'record' que se conservan como columnas (float32, NaN donde falten;
+# los canales que no aparecen en ningún registro se omiten).
+# Si el campo base no viene, se usa su variante 'enhanced_*'.
+FIT_EXTRA_FIELDS = ("heart_rate", "speed", "altitude", "cadence", "temperature")
+FIT_SEMICIRCLE_DEG = 180 / 2**31
+
+def read_fit_arrays(source, name=None):
+    """Lee los mensajes 'record' de un FIT directamente a arrays por columna.
+
+    `source` puede ser bytes, ruta o file-like. Solo se guardan los registros con
+    posición. La conversión semicírculos -> grados se hace en bloque. Devuelve el mismo
+    diccionario que read_gpx_arrays, con los canales de FIT_EXTRA_FIELDS en "ext".
+    """
+    if FitFile is None:
+        raise RuntimeError("Dependencia 'fitparse' no disponible. Instala: pip install fitparse")
+    fit = FitFile(io.BytesIO(_gpx_source_bytes(source)))
+    campos = ("timestamp", "position_lat", "position_long") + FIT_EXTRA_FIELDS
+    cols = {c: [] for c in campos}
+    for record in fit.get_messages("record"):
+        values = record.get_values()
+        if values.get("position_lat") is None or values.get("position_long") is None:
+            continue
+        for c in campos:
+            v = values.get(c)
+            cols[c].append(values.get(f"enhanced_{c}") if v is None else v)
+
+    return {
+        "lat": np.array(cols["position_lat"], dtype=np.float64) * FIT_SEMICIRCLE_DEG,
+        "lon": np.array(cols["position_long"], dtype=np.float64) * FIT_SEMICIRCLE_DEG,
+        "ele": np.array(cols["altitude"], dtype=np.float64),
+        "time": _utc_naive(cols["timestamp"]),
+        "ext": {
+            c: np.array(cols[c], dtype=np.float64).astype(np.float32)
+            for c in FIT_EXTRA_FIELDS
+            if any(v is not None for v in cols[c])
+        },
+        "creator": "FIT",
+        "name": name,
+        "tracks": 1,
+        "segments": 1,
+        "ini_ultimo_segmento": 0,
+    }
+
+# --- Escritura GPX vectorizada ---
+# Los canales conocidos se escriben como Garmin TrackPointExtension (v2); el resto,
+# con el prefijo maxsail.
+GPX_TPX_NS = "http://www.garmin.com/xmlschemas/TrackPointExtension/v2"
+GPX_MAXSAIL_NS = "https://github.com/maxsail-project/maxsail-analytics"
+GPX_TPX_TAGS = {
+    "heart_rate": "hr", "cadence": "cad", "temperature": "atemp",
+    "water_temperature": "wtemp", "speed": "speed", "course": "course", "depth": "depth",
+}
+GPX_WRITE_CHUNK = 50000
+
+def _gpx_elements(values, fmt):
+    """Texto XML de un valor opcional por punto ('' donde es NaN)."""
+    return [fmt % v if v == v else "" for v in values.tolist()]
+
+def iter_gpx_xml(lat, lon, time, ele=None, ext=None, name=None,
+                 creator="maxSail GPX Cutter", chunk_size=GPX_WRITE_CHUNK, segment_starts=None):
+    """Genera el XML de un GPX (un track) por bloques de chunk_size puntos.
+    lat/lon/tiempo se formatean en bloque: cada bloque es una sola operación de
+    formato sobre una plantilla repetida, sin objetos gpxpy por punto.
+    `time` puede ser naive (UTC) o con zona; `ext` es un dict canal -> array (NaN = sin dato).
+    `segment_starts` (opcional): índices de punto donde empieza un nuevo <trkseg>.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    t = pd.DatetimeIndex(time)
+    if t.tz is not None:
+        t = t.tz_convert(None)
+    t = t.to_numpy("datetime64[ns]")
+    validos = t[~np.isnat(t)].astype(np.int64)
+    unit = "s" if (validos % 10**9 == 0).all() else "ms"
+    ele = None if ele is None else np.asarray(ele, dtype=np.float64)
+    ext = {k: np.asarray(v, dtype=np.float64) for k, v in (ext or {}).items()}
+    tpx = [(GPX_TPX_TAGS[k], v) for k, v in ext.items() if k in GPX_TPX_TAGS]
+    otros = [(k, v) for k, v in ext.items() if k not in GPX_TPX_TAGS]
+
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<gpx version="1.1" creator="{xml_escape(creator)}" xmlns="http://www.topografix.com/GPX/1/1"'
+        f' xmlns:gpxtpx="{GPX_TPX_NS}" xmlns:maxsail="{GPX_MAXSAIL_NS}">\n'
+        "  <trk>\n"
+        + (f"    <name>{xml_escape(name)}</name>\n" if name else "")
+        + "    <trkseg>\n"
+    )
+    nuevos_seg = {int(i) for i in (segment_starts if segment_starts is not None else []) if 0 < i < lat.size}
+    limites = sorted(set(range(0, lat.size, chunk_size)) | nuevos_seg | {lat.size})
+    for a, b in zip(limites[:-1], limites[1:]):
+        if a in nuevos_seg:
+            yield "    </trkseg>\n    <trkseg>\n"
+        sl = slice(a, b)
+        columnas = [lat[sl], lon[sl]]
+        tpl = '      <trkpt lat="%.8f" lon="%.8f">'
+        if ele is not None:
+            columnas.append(_gpx_elements(ele[sl], "<ele>%.2f</ele>"))
+            tpl += "%s"
+        columnas.append([
+            "" if s == "NaT" else f"<time>{s}Z</time>"
+            for s in np.datetime_as_string(t[sl], unit=unit).tolist()
+        ])
+        tpl += "%s"
+        if ext:
+            tpl += "<extensions>"
+            if tpx:
+                tpl += "<gpxtpx:TrackPointExtension>"
+                for tag, v in tpx:
+                    columnas.append(_gpx_elements(v[sl], f"<gpxtpx:{tag}>%g</gpxtpx:{tag}>"))
+                    tpl += "%s"
+                tpl += "</gpxtpx:TrackPointExtension>"
+            for tag, v in otros:
+                columnas.append(_gpx_elements(v[sl], f"<maxsail:{tag}>%g</maxsail:{tag}>"))
+                tpl += "%s"
+            tpl += "</extensions>"
+        tpl += "</trkpt>\n"
+        k = len(columnas[0])
+        filas = np.empty((k, len(columnas)), dtype=object)
+        for j, col in enumerate(columnas):
+            filas[:, j] = col
+        yield (tpl * k) % tuple(filas.ravel().tolist())
+    yield "    </trkseg>\n  </trk>\n</gpx>\n"
+
+def write_gpx(buffer, lat, lon, time, **kwargs):
+    """Escribe el GPX de iter_gpx_xml por bloques en un buffer binario (BytesIO, archivo...)."""
+    for parte in iter_gpx_xml(lat, lon, time, **kwargs):
+        buffer.write(parte.encode("utf-8"))
+    return buffer
+
+# --- Recorte GPX por rangos de bytes ---
+_TRKPT_START = re.compile(rb"<(?:[\w.-]+:)?trkpt[\s>]")
+_TRKPT_END = re.compile(rb"</(?:[\w.-]+:)?trkpt\s*>")
+
+def index_gpx_trkpts(data, times):
+    """Índice de bytes de los <trkpt> de un GPX: (inicios, fines) en orden de documento.
+    `times` son los tiempos de esos puntos (read_gpx_arrays). Devuelve None si el índice
+    no sirve para recortar por tiempo: el número de puntos no cuadra, falta algún
+    tiempo o los tiempos no están ordenados en el documento.
+    """
+    times = np.asarray(times, dtype="datetime64[ns]")
+    inicios = np.fromiter((m.start() for m in _TRKPT_START.finditer(data)), dtype=np.int64)
+    fines = np.fromiter((m.end() for m in _TRKPT_END.finditer(data)), dtype=np.int64)
+    if inicios.size == 0 or inicios.size != fines.size or inicios.size != times.size:
+        return None
+    if np.isnat(times).any() or (np.diff(times) < np.timedelta64(0)).any():
+        return None
+    return inicios, fines
+
+def trim_gpx_bytes(data, index, times, t_ini, t_fin):
+    """Recorta un GPX entre t_ini y t_fin (incluidos) copiando el XML original tal cual:
+    cabecera (hasta el primer <trkpt>), los bytes de los puntos seleccionados y pie
+    (desde el último </trkpt>). Conserva elevación, extensiones y metadatos.
+    Los límites se buscan con searchsorted sobre los tiempos. None si no hay puntos.
+    """
+    inicios, fines = index
+    times = np.asarray(times, dtype="datetime64[ns]")
+    i0 = np.searchsorted(times, np.datetime64(t_ini, "ns"), side="left")
+    i1 = np.searchsorted(times, np.datetime64(t_fin, "ns"), side="right")
+    if i1 <= i0:
+        return None
+    vista = memoryview(data)
+    return b"".join((
+        vista[:inicios[0]],
+        vista[inicios[i0]:fines[i1 - 1]],
+        vista[fines[-1]:],
+    ))
+
+# --- Remuestreo de tracks ---
+# Canales de `ext` en grados de rumbo (0-360): se interpolan por seno/coseno,
+# para que 358° → 2° pase por 0° y no por 180°.
+ANGULAR_EXT_CHANNELS = ("course", "heading", "cog", "hdg", "yaw", "yaw_deg")
+
+def _interp_channel(x_new, x, values, angular=False):
+    """np.interp ignorando los NaN del canal (NaN si el canal no tiene datos).
+    Con angular=True interpola seno y coseno y reconstruye el ángulo en [0, 360).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    ok = ~np.isnan(values)
+    if not ok.any():
+        return np.full(x_new.size, np.nan)
+    if angular:
+        rad = np.radians(values[ok])
+        seno = np.interp(x_new, x[ok], np.sin(rad))
+        coseno = np.interp(x_new, x[ok], np.cos(rad))
+        return np.mod(np.degrees(np.arctan2(seno, coseno)), 360.0)
+    return np.interp(x_new, x[ok], values[ok])
+
+def resample_track(lat, lon, time, ext=None, hz=None, every_m=None, interpolar=True, max_gap_s=10):
+    """Remuestrea un track a una frecuencia fija (hz) o a un punto cada `every_m` metros.
+
+    Se agrupan los puntos en intervalos de 1/hz segundos (o de every_m metros de
+    distancia acumulada) de forma vectorizada:
+    - interpolar=True: un punto en cada marca de la rejilla, interpolando lat/lon/tiempo
+      y los canales de `ext` (los de ANGULAR_EXT_CHANNELS por seno/coseno). No se
+      inventan puntos dentro de los huecos de grabación (más de max_gap_s entre dos
+      puntos): las marcas que caen en un hueco se descartan.
+    - interpolar=False (diezmado): se conserva el primer punto real de cada intervalo.
+    `time` en datetime64 (UTC naive). Devuelve (lat, lon, time, ext) remuestreados.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    time = np.asarray(time, dtype="datetime64[ns]")
+    ext = ext or {}
+    if lat.size < 2 or (not hz and not every_m):
+        return lat, lon, time, ext
+
+    t_ns = (time - time[0]).astype(np.int64).astype(np.float64)
+    if hz:
+        eje, paso = t_ns, 1e9 / hz
+    else:
+        eje = np.concatenate(([0.0], np.cumsum(haversine(lat[:-1], lon[:-1], lat[1:], lon[1:]))))
+        paso = float(every_m)
+
+    if interpolar:
+        rejilla = np.arange(0.0, eje[-1] + paso / 2, paso)
+        rejilla = rejilla[rejilla <= eje[-1]]
+        # Marcas dentro de un hueco: entre el punto i y el i+1 con dt > max_gap_s
+        if max_gap_s is not None:
+            hueco = np.diff(t_ns) > max_gap_s * 1e9
+            i = np.clip(np.searchsorted(eje, rejilla, side="right") - 1, 0, hueco.size - 1)
+            rejilla = rejilla[~hueco[i] | (rejilla == eje[i]) | (rejilla == eje[i + 1])]
+        # Tiempos interpolados redondeados al milisegundo
+        t_new = (np.round(np.interp(rejilla, eje, t_ns) / 1e6) * 1e6).astype(np.int64)
+        return (
+            np.interp(rejilla, eje, lat),
+            np.interp(rejilla, eje, lon),
+            time[0] + t_new.astype("timedelta64[ns]"),
+            {k: _interp_channel(rejilla, eje, v, angular=k.lower() in ANGULAR_EXT_CHANNELS).astype(np.float32)
+             for k, v in ext.items()},
+        )
+
+    # Diezmado: primer punto de cada intervalo (el eje es no decreciente)
+    _, sel = np.unique(np.floor(eje / paso).astype(np.int64), return_index=True)
+    return lat[sel], lon[sel], time[sel], {k: np.asarray(v)[sel] for k, v in ext.items()}
+
+# --- Corte por lotes de los TRAMOS del meta-data ---
+def read_track_arrays(content, file_name, extensions=True):
+    """Lee un GPX / VKX / FIT a arrays (mismo dict que read_gpx_arrays) según la extensión."""
+    nombre = os.path.splitext(file_name)[0]
+    ext = file_name.lower().rsplit(".", 1)[-1]
+    if ext == "gpx":
+        return read_gpx_arrays(content, extensions=extensions)
+    if ext == "vkx":
+        return read_vkx_arrays(content, name=nombre)
+    if ext == "fit":
+        return read_fit_arrays(content, name=nombre)
+    raise ValueError(f"Formato no soportado: {file_name}")
+
+def tramo_file_name(base, i, tramo):
+    """Nombre del GPX de un tramo: <base>-<nº>-<nombre del tramo>.gpx"""
+    nombre = re.sub(r"[^\w-]+", "_", str(tramo.get("nombre", "")).strip()).strip("_")
+    return f"{base}-{i + 1:02d}" + (f"-{nombre}" if nombre else "") + ".gpx"
+
+def tramos_to_zip(zf, file_name, trk, tramos, content=None):
+    """Añade a un ZipFile abierto un GPX por tramo (utc_ini/utc_fin) de un track ya leído
+    (dict de read_*_arrays). Los límites se buscan con searchsorted. Si `content` es el
+    GPX original y se puede indexar, se recorta copiando su XML (trim_gpx_bytes);
+    si no, se escribe con write_gpx. Si el nombre del GPX ya está en el zip (mismo nombre
+    base en otro formato) se le añade la extensión. Devuelve el resumen: una fila por tramo.
+    """
+    base = os.path.splitext(file_name)[0]
+    times = trk["time"]
+    index = None
+    if content is not None and file_name.lower().endswith(".gpx"):
+        index = index_gpx_trkpts(content, times)
+    if index is None:
+        orden = np.argsort(times, kind="stable")
+        times = times[orden]
+    resumen = []
+    for i, tramo in enumerate(tramos):
+        t_ini = pd.to_datetime(tramo["utc_ini"], utc=True).tz_convert(None)
+        t_fin = pd.to_datetime(tramo["utc_fin"], utc=True).tz_convert(None)
+        i0 = int(np.searchsorted(times, t_ini.to_datetime64(), side="left"))
+        i1 = int(np.searchsorted(times, t_fin.to_datetime64(), side="right"))
+        resumen.append({"Track": file_name, "Tramo": tramo.get("nombre") or f"Tramo {i + 1}", "Puntos": max(i1 - i0, 0)})
+        if i1 <= i0:
+            continue
+        if index is not None:
+            data = trim_gpx_bytes(content, index, times, t_ini, t_fin)
+        else:
+            sel = orden[i0:i1]
+            data = write_gpx(
+                io.BytesIO(), trk["lat"][sel], trk["lon"][sel], times[i0:i1],
+                ext={k: v[sel] for k, v in trk["ext"].items()}, name=trk["name"],
+            ).getvalue()
+        nombre = tramo_file_name(base, i, tramo)
+        if nombre in zf.NameToInfo:
+            # Mismo nombre base en otro formato (P01.gpx y P01.vkx): se añade la extensión
+            nombre = tramo_file_name(f"{base}-{file_name.rsplit('.', 1)[-1].lower()}", i, tramo)
+        zf.writestr(nombre, data)
+    return resumen
+
+def export_tramos_zip(tracks, tramos, buffer=None):
+    """Corta cada track por cada tramo (utc_ini/utc_fin del meta-data) y los guarda como
+    GPX separados en un zip. `tracks` es una lista de (file_name, content).
+    Cada archivo se lee una sola vez (ver tramos_to_zip).
+    Devuelve (buffer, resumen) con una fila por track y tramo.
+    """
+    buffer = buffer or io.BytesIO()
+    resumen = []
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for file_name, content in tracks:
+            trk = read_track_arrays(content, file_name)
+            resumen += tramos_to_zip(zf, file_name, trk, tramos, content)
+    buffer.seek(0)
+    return buffer, resumen
+
+# --- Unión de varias grabaciones ---
+def merge_track_arrays(trks, max_gap_s=60):
+    """Une varias grabaciones de una misma sesión (dicts de read_*_arrays) en un track.
+
+    Cada entrada se ordena por tiempo y se concatenan; la ordenación estable sobre esas
+    k rachas ya ordenadas equivale a un k-way merge. Los puntos con el mismo tiempo que
+    el anterior se descartan (gana el primer archivo) y los huecos de más de max_gap_s
+    abren un nuevo segmento. Los canales de `ext` se unen (NaN donde un archivo no lo trae).
+    Devuelve un dict lat, lon, ele, time, ext, segment_starts y duplicados (descartados).
+    """
+    trks = [t for t in trks if t["lat"].size]
+    if not trks:
+        vacio = np.empty(0)
+        return {"lat": vacio, "lon": vacio, "ele": vacio, "time": np.empty(0, "datetime64[ns]"),
+                "ext": {}, "segment_starts": np.empty(0, dtype=np.int64), "duplicados": 0}
+    nombres = sorted({k for t in trks for k in t["ext"]})
+    partes = []
+    for t in trks:
+        orden = np.argsort(t["time"], kind="stable")
+        partes.append({
+            "lat": t["lat"][orden], "lon": t["lon"][orden], "ele": t["ele"][orden], "time": t["time"][orden],
+            "ext": {k: (t["ext"][k][orden] if k in t["ext"] else np.full(orden.size, np.nan, dtype=np.float32))
+                    for k in nombres},
+        })
+    time = np.concatenate([p["time"] for p in partes])
+    orden = np.argsort(time, kind="stable")
+    time = time[orden]
+
+    # Duplicados (mismo instante que el punto anterior) y puntos sin tiempo
+    keep = ~np.isnat(time)
+    keep[1:] &= time[1:] != time[:-1]
+    sel = orden[keep]
+    time = time[keep]
+
+    dt = np.diff(time) / np.timedelta64(1, "s")
+    return {
+        "lat": np.concatenate([p["lat"] for p in partes])[sel],
+        "lon": np.concatenate([p["lon"] for p in partes])[sel],
+        "ele": np.concatenate([p["ele"] for p in partes])[sel],
+        "time": time,
+        "ext": {k: np.concatenate([p["ext"][k] for p in partes])[sel] for k in nombres},
+        "segment_starts": np.flatnonzero(dt > max_gap_s) + 1,
+        "duplicados": int(orden.size - sel.size),
+    }
+
+# --- División automática de sesiones ---
+def detect_track_segments(lat, lon, time, max_gap_s=60, stationary_kn=1.0,
+                          min_stationary_s=120, min_segment_s=120):
+    """Propone segmentos de navegación de un track (ordenado por tiempo).
+
+    Corta donde hay un hueco de grabación (más de max_gap_s entre puntos) y quita los
+    periodos parados (velocidad < stationary_kn durante al menos min_stationary_s).
+    Todo con diferencias vectorizadas de tiempo y posición y run-length sobre los tramos
+    entre puntos. Devuelve un array (k, 2) de rangos [inicio, fin) de índices de punto,
+    descartando los segmentos de menos de min_segment_s.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    time = np.asarray(time, dtype="datetime64[ns]")
+    if lat.size < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    t_s = (time - time[0]) / np.timedelta64(1, "s")
+
+    # Un valor por paso i -> i+1
+    dt = np.diff(t_s)
+    dist = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    v_kn = np.divide(dist, dt, out=np.zeros_like(dist), where=dt > 0) * MPS_TO_KNOTS
+
+    # Rachas de pasos parados; solo se quitan las largas
+    parado = v_kn < stationary_kn
+    ini, fin = _runs(parado)
+    larga = parado[ini] & (t_s[fin] - t_s[ini] >= min_stationary_s)
+    excluido = np.repeat(larga, fin - ini) | (dt > max_gap_s)
+
+    # Rachas de pasos válidos: los pasos [a, b) cubren los puntos [a, b]
+    ini, fin = _runs(~excluido)
+    validas = ~excluido[ini] & (t_s[fin] - t_s[ini] >= min_segment_s)
+    return np.column_stack((ini[validas], fin[validas] + 1)).astype(np.int64)
+
+def _runs(flags):
+    """Inicios y fines [ini, fin) de las rachas de valores iguales de un array booleano."""
+    cambios = np.flatnonzero(flags[1:] != flags[:-1]) + 1
+    return np.concatenate(([0], cambios)), np.concatenate((cambios, [flags.size]))
+
+# --- Esquema compacto de los tracks normalizados ---
+# SourceFile categórico (un solo texto por track en lugar de uno por fila) y cinemática
+# en float32. Lat/Lon/Dist siguen en float64 (precisión de posición) y UTC en datetime64[ns].
+TRACK_FLOAT32_COLUMNS = ("COG", "SOG", "SOGS", "TWA", "VMG", "HEEL")
+
+def compact_track_df(df):
+    """Aplica el esquema compacto a un DataFrame normalizado (modifica y devuelve df)."""
+    if df.empty:
+        return df
+    for c in TRACK_FLOAT32_COLUMNS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype(np.float32)
+    if "UTC" in df.columns and not np.issubdtype(df["UTC"].dtype, np.datetime64):
+        df["UTC"] = pd.to_datetime(df["UTC"], errors="coerce")
+    if "SourceFile" in df.columns:
+        df["SourceFile"] = df["SourceFile"].astype("category")
+    return df
+
+def concat_tracks(dfs):
+    """pd.concat de varios tracks manteniendo SourceFile categórico
+    (concat de categóricos con categorías distintas devuelve object).
+    """
+    df = pd.concat(dfs, ignore_index=True)
+    if "SourceFile" in df.columns:
+        df["SourceFile"] = df["SourceFile"].astype("category")
+    return df
+
+def track_memory_footprint(df):
+    """Memoria (bytes) del DataFrame con el esquema compacto y la que ocuparía con el
+    esquema anterior (float64 + SourceFile como texto en cada fila), sin copiarlo.
+    """
+    despues = int(df.memory_usage(deep=True).sum())
+    antes = despues
+    for c in TRACK_FLOAT32_COLUMNS:
+        if c in df.columns and df[c].dtype == np.float32:
+            antes += 4 * len(df)
+    if "SourceFile" in df.columns and isinstance(df["SourceFile"].dtype, pd.CategoricalDtype):
+        conteo = df["SourceFile"].value_counts()
+        antes -= int(df["SourceFile"].memory_usage(deep=True, index=False))
+        antes += 8 * len(df) + sum(int(n) * sys.getsizeof(str(nombre)) for nombre, n in conteo.items())
+    return antes, despues
+
+def track_arrays_to_df(lats, lons, times, file_name, TWD=None, extra=None, sog=None, cog=None):
+    """Calcula el DataFrame normalizado del visor a partir de arrays de lat/lon/tiempo.
+    Versión vectorizada del bucle punto a punto de gpx_file_to_df:
+    - El primer punto solo sirve de prev_point (no genera fila).
+    - Un punto idéntico (lat/lon) al último punto válido se descarta; eso equivale a
+      compararlo con el punto inmediatamente anterior.
+    - time_diff se mide contra el último punto válido (no contra los duplicados).
+    - Dist/COG con Geod.inv sobre arrays, SOG/TWA/VMG con NumPy.
+    Si TWD es None se estima con el primer y último punto.
+    `extra` (opcional) es un diccionario nombre -> array con canales adicionales por
+    punto (FC, velocidad del dispositivo...), que se añaden tal cual como columnas.
+    `sog` (nudos) y `cog` (grados) opcionales son los valores medidos por el dispositivo
+    en cada punto; si se pasan, sustituyen a los calculados a partir de las posiciones.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    times = np.asarray(times, dtype="datetime64[ns]")
+    if lats.size < 2:
+        return pd.DataFrame()
+    if TWD is None:
+        TWD = estimate_wind_direction(lats[0], lons[0], lats[-1], lons[-1])
+
+    # Saltar puntos duplicados
+    idx = np.flatnonzero((lats[1:] != lats[:-1]) | (lons[1:] != lons[:-1])) + 1
+    if idx.size == 0:
+        return pd.DataFrame()
+    # prev_point de cada punto válido: el válido anterior (o el primer punto)
+    prev = np.concatenate(([0], idx[:-1]))
+
+    lat1, lon1, lat2, lon2 = lats[prev], lons[prev], lats[idx], lons[idx]
+    bearing_to, _, distance = wgs84.inv(lon1, lat1, lon2, lat2)
+    COG = (np.asarray(bearing_to) + 360) % 360
+    distance = np.asarray(distance)
+
+    time_diff = (times[idx] - times[prev]) / np.timedelta64(1, "s")
+
+    # SOG en nudos (misma fórmula que calculate_velocity)
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2
+    distance_in_nm = 3440.065 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    time_in_hours = time_diff / 3600.0
+    SOG = np.divide(distance_in_nm, time_in_hours, out=np.zeros_like(distance_in_nm), where=time_in_hours > 0)
+
+    if sog is not None:
+        SOG = np.asarray(sog, dtype=np.float64)[idx]
+    if cog is not None:
+        COG = np.asarray(cog, dtype=np.float64)[idx] % 360
+
+    # TWA (misma convención que estimate_twa) y VMG (calculate_vmg)
+    TWA = (TWD - COG + 360) % 360
+    TWA = np.round(np.where(TWA > 180, TWA - 360, TWA), 1)
+    VMG = np.round(SOG * np.cos(np.radians(TWA)), 2)
+
+    df = pd.DataFrame({
+        'Lat': lat2,
+        'Lon': lon2,
+        'UTC': times[idx],
+        'COG': np.round(COG).astype(np.int64),
+        'SOG': np.round(SOG, 2),
+        'Dist': np.round(distance, 2),
+        'SourceFile': file_name,
+        'TWA': TWA,
+        'VMG': VMG,
+    })
+
+    # --- SOG smooth / suavizada (SOGS) ---
+    # Media móvil de 5 puntos (centrada)
+    df['SOGS'] = df['SOG'].rolling(window=5, center=True, min_periods=1).mean()
+
+    for nombre, valores in (extra or {}).items():
+        df[nombre] = np.asarray(valores)[idx]
+
+    return compact_track_df(df)
+
 def gpx_file_to_df(gpx_file, file_name):
     """Convierte un archivo GPX en un DataFrame normalizado para el visor.
     - Normaliza timestamps para calcular time_diff correctamente.
@@ -94,72 +973,451 @@ def gpx_file_to_df(gpx_file, file_name):
     - Calcula Dist, COG, SOG, TWA y VMG.
     - Gestiona prev_point para evitar picos falsos de velocidad.
     - Devuelve un DataFrame limpio listo para el visor.
+    El GPX se lee en streaming (read_gpx_arrays) y todas las columnas se calculan en
+    bloque sobre arrays (ver track_arrays_to_df).
     """
-    gpx = gpxpy.parse(gpx_file)
-    rows = []
-    prev_point = None
-    first_point = None
-    last_point = None
+    return gpx_arrays_to_df(read_gpx_arrays(gpx_file), file_name)
 
-    # Buscar primer y último punto
-    for track in gpx.tracks:
-        for segment in track.segments:
-            if segment.points:
-                first_point = segment.points[0]
-                last_point = segment.points[-1]
-    if not first_point or not last_point:
+def gpx_arrays_to_df(trk, file_name):
+    """DataFrame normalizado a partir del dict de read_gpx_arrays.
+    Los puntos sin hora válida (trk["sin_hora"]) se descartan.
+    """
+    lats, lons, times, ini_seg = trk["lat"], trk["lon"], trk["time"], trk["ini_ultimo_segmento"]
+    if trk.get("sin_hora"):
+        con_hora = ~np.isnat(times)
+        ini_seg = int(con_hora[:ini_seg].sum())
+        lats, lons, times = lats[con_hora], lons[con_hora], times[con_hora]
+        ini_seg = min(ini_seg, lats.size - 1)
+    if lats.size == 0:
         return pd.DataFrame()
-    TWD = estimate_wind_direction(first_point.latitude, first_point.longitude, last_point.latitude, last_point.longitude)
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                # Inicializar prev_point en el primer punto válido
-                if prev_point is None:
-                    prev_point = point
-                    continue
-                # Saltar puntos duplicados
-                if point.latitude == prev_point.latitude and point.longitude == prev_point.longitude:
-                    continue
-                lat, lon = point.latitude, point.longitude
-                distance, COG, _ = calculate_distance_bearing(prev_point.latitude, prev_point.longitude, lat, lon)
-
-                # Normalizar timestamps para evitar mezcla UTC/naive
-                curr_time = point.time.replace(tzinfo=None)
-                prev_time = prev_point.time.replace(tzinfo=None)
-
-                time_diff = (curr_time - prev_time).total_seconds()
-                SOG = calculate_velocity(prev_point.latitude, prev_point.longitude, lat, lon, time_diff)
-                UTC = curr_time
-                TWA = estimate_twa(COG, TWD)
-                VMG = calculate_vmg(SOG, TWA)
-                # Construir fila del DataFrame track
-                row = {
-                    'Lat': lat,
-                    'Lon': lon,
-                    'UTC': UTC,
-                    'COG': round(COG),
-                    'SOG': round(SOG, 2),
-                    'Dist': round(distance, 2),
-                    'SourceFile': file_name,
-                    'TWA': TWA,
-                    'VMG': VMG,
-                }
-                rows.append(row)
-                # Actualizar prev_point para el siguiente loop
-                prev_point = point
-
-    df = pd.DataFrame(rows)
-
-    if not df.empty and 'UTC' in df.columns:
-        df['UTC'] = pd.to_datetime(df['UTC']).dt.tz_localize(None)
+    # TWD estimado con el primer y último punto del último segmento con puntos
+    TWD = estimate_wind_direction(lats[ini_seg], lons[ini_seg], lats[-1], lons[-1])
+    return track_arrays_to_df(lats, lons, times, file_name, TWD=TWD)
+
+def fit_file_to_df(fit_file, file_name):
+    """Convierte un archivo FIT en el DataFrame normalizado del visor (como gpx_file_to_df),
+    conservando los canales extra del dispositivo (heart_rate, speed, altitude...).
+    """
+    trk = read_fit_arrays(fit_file)
+    if trk["lat"].size == 0:
+        return pd.DataFrame()
+    return track_arrays_to_df(trk["lat"], trk["lon"], trk["time"], file_name, extra=trk["ext"])
+
+def vkx_file_to_df(vkx_file, file_name):
+    """Convierte un archivo VKX de Vakaros en el DataFrame normalizado del visor.
+    SOG y COG son los del dispositivo (fila 0x02) y HEEL la escora del cuaternio,
+    en lugar de recalcularlos a partir de las posiciones.
+    """
+    trk = read_vkx_arrays(vkx_file)
+    if trk["lat"].size == 0:
+        return pd.DataFrame()
+    ext = trk["ext"]
+    return track_arrays_to_df(
+        trk["lat"], trk["lon"], trk["time"], file_name,
+        extra={"HEEL": np.round(ext["heel"], 1)},
+        sog=ext["speed"] * MPS_TO_KNOTS,
+        cog=ext["course"],
+    )
 
-    # --- SOG smooth / suavizada (SOGS) ---
-    if not df.empty and 'SOG' in df.columns:
-        # Media móvil de 5 puntos (centrada)
-        df['SOGS'] = df['SOG'].rolling(window=5, center=True, min_periods=1).mean()
 
+# -----------------------------
+# Vakaros import helpers (CSV)
+# -----------------------------
+
+# Columns of the Vakaros CSV used by the viewer, with their types
+# (hdg_true, heel, trim... are not read)
+VAKAROS_CSV_DTYPES = {
+    "timestamp": str,
+    "latitude": "float64",
+    "longitude": "float64",
+    "sog_kts": "float64",
+    "cog": "float64",
+}
+
+def read_vakaros_csv(source):
+    """Fast path for Vakaros CSV: only the columns in VAKAROS_CSV_DTYPES, already typed.
+    If a value is not numeric, re-read without dtypes and let normalize_vakaros_csv coerce it.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    try:
+        return pd.read_csv(source, usecols=list(VAKAROS_CSV_DTYPES), dtype=VAKAROS_CSV_DTYPES)
+    except ValueError:
+        source.seek(0)
+        return pd.read_csv(source, usecols=list(VAKAROS_CSV_DTYPES))
+
+def _ensure_dist_column(df):
+    """Add Dist column (meters between consecutive points), using the array haversine."""
+    lat = df["Lat"].to_numpy(dtype=np.float64)
+    lon = df["Lon"].to_numpy(dtype=np.float64)
+    d = np.zeros(len(df))
+    if len(df) > 1:
+        d[1:] = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    df["Dist"] = d
+    return df
+
+def normalize_vakaros_csv(df_raw, source_name):
+    """Map Vakaros CSV columns to maxSail normalized schema."""
+    df = df_raw.copy()
+
+    # expected columns from Vakaros:
+    # timestamp,latitude,longitude,sog_kts,cog,hdg_true,heel,trim
+    df = df.rename(columns={
+        "timestamp": "UTC",
+        "latitude": "Lat",
+        "longitude": "Lon",
+        "sog_kts": "SOG",
+        "cog": "COG",
+    })
+
+    # Compatibilidad maxSail: el core usa SOGS en varios sitios
+    if "SOG" in df.columns and "SOGS" not in df.columns:
+        df["SOGS"] = df["SOG"]
+
+    # Normaliza tiempo: convierte a UTC real y deja naive (datetime64[ns])
+    df["UTC"] = pd.to_datetime(df["UTC"], utc=True).dt.tz_convert(None)
+
+    # Coerce numeric
+    for c in ["Lat", "Lon", "SOG", "SOGS", "COG"]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    # Orden / limpieza básica
+    df = df.dropna(subset=["UTC", "Lat", "Lon"]).sort_values("UTC").reset_index(drop=True)
+
+    # Distancia incremental
+    df = _ensure_dist_column(df)
+
+    # Metadato útil
+    df["SourceFile"] = source_name
+
+    return compact_track_df(df)
+
+def gpx_time_warning(trk, file_name):
+    """Aviso para el usuario si el GPX tiene puntos sin <time> válido (None si no hay)."""
+    if not trk.get("sin_hora"):
+        return None
+    total = trk["lat"].size
+    if trk["sin_hora"] == total:
+        return f"El GPX {file_name} no tiene ningún <time> válido: no se puede usar."
+    return f"El GPX {file_name} tiene {trk['sin_hora']} de {total} puntos sin <time> válido (descartados)."
+
+def parse_track_bytes(content, file_name):
+    """Normaliza un archivo subido al visor (GPX, CSV, FIT o VKX) a partir de sus bytes.
+    Devuelve (df, aviso): aviso es None o un texto para mostrar al usuario.
+    """
+    if file_name.lower().endswith('.csv'):
+        # Solo la cabecera: decide el formato antes de leer el archivo completo
+        columns = pd.read_csv(io.BytesIO(content), nrows=0).columns
+
+        # 1) Normalizado maxSail
+        if all(col in columns for col in ['Lat', 'Lon', 'UTC', 'COG', 'SOG', 'Dist']):
+            df = pd.read_csv(io.BytesIO(content), delimiter=',')
+            if not np.issubdtype(df['UTC'].dtype, np.datetime64):
+                df['UTC'] = pd.to_datetime(df['UTC'], errors='coerce')
+
+        # 2) Vakaros CSV (timestamp, latitude, longitude, sog_kts, cog, ...)
+        elif all(col in columns for col in VAKAROS_CSV_DTYPES):
+            df = normalize_vakaros_csv(read_vakaros_csv(content), file_name)
+
+        else:
+            return pd.DataFrame(), f"El archivo {file_name} no tiene columnas requeridas."
+
+        if "SourceFile" not in df.columns:
+            df["SourceFile"] = file_name
+        return compact_track_df(df), None
+    elif file_name.lower().endswith('.gpx'):
+        trk = read_gpx_arrays(content)
+        return gpx_arrays_to_df(trk, file_name), gpx_time_warning(trk, file_name)
+    elif file_name.lower().endswith('.fit'):
+        try:
+            return fit_file_to_df(content, file_name), None
+        except Exception as e:
+            return pd.DataFrame(), f"No se pudo leer el FIT {file_name}: {e}"
+    elif file_name.lower().endswith('.vkx'):
+        return vkx_file_to_df(content, file_name), None
+    return pd.DataFrame(), None
+
+# --- Caché de tracks normalizados (por contenido) ---
+# Subir TRACK_PARSER_VERSION cada vez que cambie la normalización de los tracks,
+# para que no se reutilicen resultados calculados con la versión anterior.
+TRACK_PARSER_VERSION = "4"
+TRACK_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+_track_cache = OrderedDict()
+_track_cache_bytes = 0
+_track_cache_lock = threading.Lock()
+
+def track_content_hash(content):
+    """Hash SHA-1 del contenido del archivo (clave de caché)."""
+    return hashlib.sha1(content).hexdigest()
+
+# --- Almacén en disco (Feather/Arrow) de tracks normalizados ---
+# Un archivo por contenido: <TRACK_STORE_DIR>/<etiqueta>/<hash>.feather
+# La etiqueta depende de la versión del parser y del esquema (columnas y dtypes) que
+# produce la normalización, así que al cambiar cualquiera de los dos los archivos
+# anteriores dejan de usarse.
+TRACK_STORE_DIR = os.environ.get("MAXSAIL_TRACK_STORE", ".maxsail-cache")
+
+@lru_cache(maxsize=None)
+def track_store_schema():
+    """Columnas y dtypes del DataFrame normalizado, tal como los produce
+    track_arrays_to_df (+ compact_track_df) con todos los canales opcionales
+    (SOG/COG del dispositivo y HEEL del VKX) sobre un track de prueba de 3 puntos.
+    """
+    lat = 39.4 + np.arange(3) * 1e-4
+    time = np.datetime64("2025-01-01T00:00:00", "ns") + np.arange(3) * np.timedelta64(1, "s")
+    df = track_arrays_to_df(
+        lat, np.full(3, -0.3), time, "schema",
+        extra={"HEEL": np.zeros(3)}, sog=np.ones(3), cog=np.zeros(3),
+    )
+    return tuple((col, str(dtype)) for col, dtype in df.dtypes.items())
+
+def track_store_tag():
+    """Etiqueta de invalidación del almacén: versión del parser + esquema normalizado."""
+    esquema = ",".join(f"{col}:{dtype}" for col, dtype in track_store_schema())
+    firma = f"{TRACK_PARSER_VERSION}|{esquema}"
+    return f"v{TRACK_PARSER_VERSION}-{hashlib.sha1(firma.encode()).hexdigest()[:8]}"
+
+def track_store_path(content_hash, store_dir=None):
+    return os.path.join(store_dir or TRACK_STORE_DIR, track_store_tag(), f"{content_hash}.feather")
+
+def track_store_index_path(store_dir=None):
+    """Índice de sesiones del almacén (lo escribe maxsail-batch-ingest.py)."""
+    return os.path.join(store_dir or TRACK_STORE_DIR, track_store_tag(), "index.json")
+
+def load_track_store(content_hash, file_name, store_dir=None):
+    """Lee un track normalizado del almacén con memory mapping. None si no existe.
+    El DataFrame devuelto es escribible: no queda ligado al archivo mapeado.
+    """
+    if feather is None:
+        return None
+    path = track_store_path(content_hash, store_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except Exception:
+        return None
+    meta = table.schema.metadata or {}
+    if meta.get(b"maxsail_tag", b"").decode() != track_store_tag():
+        return None
+    # El mmap evita leer el archivo a un buffer intermedio; to_pandas copia las columnas
+    # a bloques de pandas propios (sin split_blocks las numéricas serían vistas de solo
+    # lectura sobre el mapeo y el visor no podría asignar columnas)
+    df = table.to_pandas()
+    # SourceFile asignado a partir del nombre del archivo: usar el nombre actual
+    nombre = meta.get(b"maxsail_source", b"").decode()
+    if "SourceFile" in df.columns and nombre != file_name and (df["SourceFile"] == nombre).all():
+        df["SourceFile"] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), [file_name])
     return df
 
+def save_track_store(content_hash, file_name, df, store_dir=None):
+    """Guarda un track normalizado en el almacén (Feather sin compresión, apto para mmap).
+    Devuelve la ruta o None si no se pudo escribir (sin pyarrow, disco de solo lectura...).
+    """
+    if feather is None or df.empty:
+        return None
+    path = track_store_path(content_hash, store_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"maxsail_tag": track_store_tag().encode(),
+            b"maxsail_source": file_name.encode(),
+        })
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+    return path
+
+def _track_cache_get(key):
+    with _track_cache_lock:
+        if key in _track_cache:
+            _track_cache.move_to_end(key)
+            return _track_cache[key][0]
+    return None
+
+def _track_cache_put(key, result):
+    global _track_cache_bytes
+    size = int(result[0].memory_usage(deep=True).sum())
+    with _track_cache_lock:
+        if key not in _track_cache:
+            _track_cache[key] = (result, size)
+            _track_cache_bytes += size
+        # Expulsar los menos usados recientemente (siempre se conserva el último)
+        while _track_cache_bytes > TRACK_CACHE_MAX_BYTES and len(_track_cache) > 1:
+            _, (_, old_size) = _track_cache.popitem(last=False)
+            _track_cache_bytes -= old_size
+
+def _track_result_copy(result):
+    """Copia de un resultado (df, aviso) de la caché: quien lo recibe puede modificarlo."""
+    return result[0].copy(), result[1]
+
+def _track_cache_lookup(content, file_name):
+    """Busca un archivo en la caché en memoria y luego en el almacén en disco.
+    Devuelve (key, result); result es None si hay que parsearlo.
+    """
+    content_hash = track_content_hash(content)
+    key = (content_hash, TRACK_PARSER_VERSION, file_name)
+    result = _track_cache_get(key)
+    if result is None:
+        df = load_track_store(content_hash, file_name)
+        if df is not None:
+            result = (df, None)
+            _track_cache_put(key, result)
+    return key, result
+
+def _track_cache_store(key, file_name, result):
+    """Guarda un resultado recién parseado en el almacén en disco y en la caché."""
+    if result[1] is None:
+        save_track_store(key[0], file_name, result[0])
+    _track_cache_put(key, result)
+
+def load_track_cached(content, file_name):
+    """Igual que parse_track_safe, pero reutiliza el resultado si el mismo contenido
+    (hash + versión del parser) ya se normalizó en este proceso o está en el almacén
+    en disco (TRACK_STORE_DIR).
+    LRU acotada a TRACK_CACHE_MAX_BYTES. Se devuelve siempre una copia del DataFrame
+    de la caché, así que el llamador puede añadir o modificar columnas.
+    """
+    key, result = _track_cache_lookup(content, file_name)
+    if result is None:
+        result = parse_track_safe(content, file_name)
+        _track_cache_store(key, file_name, result)
+    return _track_result_copy(result)
+
+def parse_track_safe(content, file_name):
+    """parse_track_bytes que nunca lanza: un archivo ilegible (XML roto, VKX truncado...)
+    o sin puntos válidos devuelve (DataFrame vacío, aviso) en lugar de abortar el lote.
+    """
+    try:
+        df, aviso = parse_track_bytes(content, file_name)
+    except Exception as e:
+        return pd.DataFrame(), f"No se pudo leer {file_name}: {e}"
+    if df.empty and aviso is None:
+        aviso = f"El archivo {file_name} no tiene puntos válidos."
+    return df, aviso
+
+# Pool de procesos compartido por todas las cargas (y reruns de Streamlit) del proceso:
+# arrancar los workers cuesta más que parsear un GPX pequeño, así que se reutiliza.
+# Se arranca con "spawn": el servidor de Streamlit tiene varios hilos y un fork
+# heredaría sus locks. Tiene tantos workers como archivos del lote más grande visto
+# (hasta max_workers / núcleos), no un worker ocioso por núcleo.
+_track_pool = None
+_track_pool_workers = 0
+_track_pool_lock = threading.Lock()
+
+def _track_parse_pool(n_files, max_workers=None):
+    global _track_pool, _track_pool_workers
+    workers = max(1, min(n_files, max_workers or os.cpu_count() or 1))
+    with _track_pool_lock:
+        if _track_pool is None or _track_pool_workers < workers:
+            if _track_pool is not None:
+                _track_pool.shutdown(wait=False)
+            _track_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _track_pool_workers = workers
+        return _track_pool
+
+def _parse_tracks_parallel(pendientes, max_workers=None):
+    """Parsea [(content, file_name), ...] en el pool compartido; en serie si el pool falla."""
+    global _track_pool
+    try:
+        return list(_track_parse_pool(len(pendientes), max_workers).map(
+            parse_track_safe,
+            [content for content, _ in pendientes],
+            [file_name for _, file_name in pendientes],
+        ))
+    except BrokenProcessPool:
+        # Un worker murió (memoria, señal...): se descarta el pool y se sigue en serie
+        with _track_pool_lock:
+            _track_pool = None
+        return [parse_track_safe(content, file_name) for content, file_name in pendientes]
+
+def load_tracks_cached(files, max_workers=None):
+    """Versión multi-archivo de load_track_cached. `files` es una lista de (content, file_name).
+    Los archivos que no están en caché ni en el almacén se parsean a la vez en el pool
+    de procesos compartido (como mucho max_workers procesos); si solo falta uno, se
+    parsea en serie en este proceso. Un archivo que no se puede leer no aborta el resto:
+    devuelve (DataFrame vacío, aviso).
+    Devuelve [(df, aviso), ...] en el mismo orden que `files`; cada df es una copia
+    propia (ver load_track_cached).
+    """
+    results = [None] * len(files)
+    pendientes = []
+    for i, (content, file_name) in enumerate(files):
+        key, results[i] = _track_cache_lookup(content, file_name)
+        if results[i] is None:
+            pendientes.append((i, key, content, file_name))
+
+    if len(pendientes) > 1:
+        parsed = _parse_tracks_parallel([(p[2], p[3]) for p in pendientes], max_workers)
+    else:
+        parsed = [parse_track_safe(content, file_name) for _, _, content, file_name in pendientes]
+
+    for (i, key, _, file_name), result in zip(pendientes, parsed):
+        _track_cache_store(key, file_name, result)
+        results[i] = result
+    return [_track_result_copy(result) for result in results]
+
+TRACK_FILE_EXTENSIONS = (".gpx", ".csv", ".vkx", ".fit")
+
+def ingest_track_file(path, store_dir=None, force=False):
+    """Normaliza un archivo de track y lo deja en el almacén en disco (uso por lotes).
+    Pensada para ejecutarse en un proceso aparte: solo devuelve la entrada del índice
+    (archivo, hash, estado, puntos, inicio/fin UTC, aviso), no el DataFrame.
+    estado es "ok" si el track queda en el almacén y "error" si no (aviso dice por qué).
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    file_name = os.path.basename(path)
+    content_hash = track_content_hash(content)
+    entrada = {"archivo": file_name, "ruta": path, "hash": content_hash, "estado": "error", "puntos": 0, "aviso": None}
+
+    df = None if force else load_track_store(content_hash, file_name, store_dir)
+    if df is None:
+        df, entrada["aviso"] = parse_track_safe(content, file_name)
+        if entrada["aviso"] is None and not df.empty:
+            if save_track_store(content_hash, file_name, df, store_dir) is None:
+                entrada["aviso"] = f"No se pudo guardar {file_name} en el almacén"
+
+    if entrada["aviso"] is None:
+        entrada["estado"] = "ok"
+    if not df.empty:
+        entrada["puntos"] = len(df)
+        entrada["inicio"] = df["UTC"].iloc[0].isoformat()
+        entrada["fin"] = df["UTC"].iloc[-1].isoformat()
+    return entrada
+
+
+# --- Proyecciones UTM (registro por proceso) ---
+def utm_epsg(lat, lon):
+    """
+    Código EPSG de la zona UTM WGS84 que contiene el centroide de los puntos
+    (326xx hemisferio norte, 327xx hemisferio sur). Admite escalares o arrays.
+    """
+    lat_c = float(np.nanmean(lat))
+    lon_c = float(np.nanmean(lon))
+    zone = int(np.floor((lon_c + 180) / 6)) % 60 + 1
+    return (32600 if lat_c >= 0 else 32700) + zone
+
+@lru_cache(maxsize=None)
+def utm_transformer(epsg):
+    """Transformer WGS84 (lon, lat) → EPSG dado. Se crea una sola vez por proceso."""
+    return Transformer.from_crs("EPSG:4326", f"EPSG:{int(epsg)}", always_xy=True)
+
+def _points_epsg(*coords):
+    """Zona UTM del centroide de varios grupos de coordenadas: _points_epsg(lat1, lon1, lat2, lon2...)."""
+    lats = np.concatenate([np.ravel(c) for c in coords[0::2]]).astype(float)
+    lons = np.concatenate([np.ravel(c) for c in coords[1::2]]).astype(float)
+    return utm_epsg(lats, lons)
 
 def distance_on_axis(lat1, lon1, lat2, lon2, axis_deg):
     """
@@ -195,18 +1453,16 @@ def distance_on_ladder(lat1, lon1, lat2, lon2, twd_deg):
 
     # Dirección viento en radianes
     twd_rad = np.radians(twd_deg % 360)
-    # Vector unitario del viento (eje principal)
-    u_wind = np.array([np.sin(twd_rad), np.cos(twd_rad)])
-    # Vector barco1 -> barco2
-    v = np.array([xm, ym])
-    # Proyección sobre el eje viento
-    avance = np.dot(v, u_wind)
+    # Vector unitario del viento (eje principal), por componentes para admitir arrays
+    ux, uy = np.sin(twd_rad), np.cos(twd_rad)
+    # Proyección del vector barco1 -> barco2 sobre el eje viento
+    avance = xm * ux + ym * uy
     # Vector ortogonal desde barco2 a la recta del peldaño de barco1
-    v_ort = v - avance * u_wind
+    ox, oy = xm - avance * ux, ym - avance * uy
     # Distancia mínima entre el punto y la recta (peldaño)
-    dist_ladder = np.linalg.norm(v_ort)
+    dist_ladder = np.hypot(ox, oy)
     # Signo: positivo si barco2 está a barlovento de barco1, negativo si a sotavento
-    sign = np.sign(np.cross(u_wind, v_ort))
+    sign = np.sign(ux * oy - uy * ox)
     return sign * dist_ladder
 
 def ladder_position(lat, lon, lat_ref, lon_ref, twd_deg):
@@ -220,9 +1476,7 @@ def ladder_position(lat, lon, lat_ref, lon_ref, twd_deg):
     xm = R * dlon * np.cos(np.radians((lat + lat_ref) / 2))
     ym = R * dlat
     twd_perp_rad = np.radians((twd_deg + 90) % 360)
-    u_perp = np.array([np.sin(twd_perp_rad), np.cos(twd_perp_rad)])
-    v = np.array([xm, ym])
-    pos_ladder = np.dot(v, u_perp)
+    pos_ladder = xm * np.sin(twd_perp_rad) + ym * np.cos(twd_perp_rad)
     return pos_ladder
 
 def ladder_distance(lat1, lon1, lat2, lon2, twd_deg, lat_ref=None, lon_ref=None):
@@ -239,13 +1493,12 @@ def ladder_distance(lat1, lon1, lat2, lon2, twd_deg, lat_ref=None, lon_ref=None)
 def ladder_distance_utm(lat1, lon1, lat2, lon2, twd_deg, utm_zone=None):
     """
     Distancia barlovento/sotavento (en metros) usando UTM.
-    Si utm_zone no se especifica, se deduce automáticamente a partir de lon1.
+    Si utm_zone (hemisferio norte) no se especifica, se deduce del centroide de los puntos.
     """
-    if utm_zone is None: 
-        utm_zone = int((lon1 + 180) / 6) + 1
-    p = Proj(proj='utm', zone=utm_zone, ellps='WGS84')
-    x1, y1 = p(lon1, lat1)
-    x2, y2 = p(lon2, lat2)
+    epsg = _points_epsg(lat1, lon1, lat2, lon2) if utm_zone is None else 32600 + int(utm_zone)
+    tf = utm_transformer(epsg)
+    x1, y1 = tf.transform(lon1, lat1)
+    x2, y2 = tf.transform(lon2, lat2)
     theta = np.radians(twd_deg + 90)
     u_x = np.cos(theta)
     u_y = np.sin(theta)
@@ -254,25 +1507,88 @@ def ladder_distance_utm(lat1, lon1, lat2, lon2, twd_deg, utm_zone=None):
     dist_perpendicular = delta_x * u_x + delta_y * u_y
     return dist_perpendicular
 
-def ladder_distance_rung(lat1, lon1, lat2, lon2, twd_deg):
+def _rung_projection(lat, lon, twd_deg, epsg):
+    """Posición (m) de cada punto sobre el eje perpendicular al viento (UTM). Admite arrays."""
     # 1. Conversión Lat/Lon → UTM ------------------
-    tf = Transformer.from_crs("EPSG:4326", "EPSG:25829", always_xy=True)
-    x1, y1 = tf.transform(lon1, lat1)
-    x2, y2 = tf.transform(lon2, lat2)
+    x, y = utm_transformer(epsg).transform(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
 
     # 2. Vectores unitarios ------------------------
-    θ = math.radians(twd_deg)
-    p_x = -math.cos(θ)   # componente Este del perpendicular
-    p_y =  math.sin(θ)   # componente Norte del perpendicular
+    θ = np.radians(twd_deg)
+    p_x = -np.cos(θ)   # componente Este del perpendicular
+    p_y =  np.sin(θ)   # componente Norte del perpendicular
 
-    # 3. Proyecciones ------------------------------
-    d1 = x1 * p_x + y1 * p_y
-    d2 = x2 * p_x + y2 * p_y
+    # 3. Proyección --------------------------------
+    return x * p_x + y * p_y
 
-    # 4. Ladder rung -------------------------------
-    ladder_rung_m = (d2 - d1)
+def ladder_distance_rung(lat1, lon1, lat2, lon2, twd_deg, epsg=None):
+    """
+    Separación lateral (m) entre barcos sobre el peldaño perpendicular al viento.
+    Admite escalares o arrays (series sincronizadas, TWD fijo o por muestra).
+    epsg: CRS UTM a usar; por defecto, la zona del centroide de los puntos (utm_epsg).
+    Sin puntos devuelve un array vacío.
+    """
+    if np.size(lat1) == 0:
+        return np.empty(np.shape(lat1))
+    if epsg is None:
+        epsg = _points_epsg(lat1, lon1, lat2, lon2)
+    # Ladder rung: diferencia de proyecciones ----
+    ladder_rung_m = _rung_projection(lat2, lon2, twd_deg, epsg) - _rung_projection(lat1, lon1, twd_deg, epsg)
+    if np.ndim(ladder_rung_m) == 0:
+        return float(ladder_rung_m)
     return ladder_rung_m
 
+# --- Separación entre barcos en lote (series y flota) ---
+def pair_separation_series(df1, df2, twd_deg, tolerance_s=2):
+    """
+    Sincroniza dos tracks por UTC (muestra más cercana dentro de tolerance_s) y
+    calcula en una sola llamada, para todo el tramo, la separación del barco 2
+    respecto al barco 1:
+    - Dist_Eje: distancia sobre el eje del viento (positivo: barco 2 a barlovento).
+    - Dist_Peldaño: separación lateral sobre el peldaño (ladder_distance_rung).
+    twd_deg puede ser un escalar o una columna/array alineado con df1.
+    Devuelve un DataFrame con UTC, Lat1, Lon1, Lat2, Lon2, Dist_Eje, Dist_Peldaño.
+    """
+    cols = ["UTC", "Lat", "Lon"]
+    a = df1[cols].reset_index(drop=True)
+    a["_twd"] = np.broadcast_to(np.asarray(twd_deg, dtype=float), len(a))
+    a = a.dropna(subset=cols).sort_values("UTC")
+    b = df2[cols].dropna().sort_values("UTC")
+    par = pd.merge_asof(a, b, on="UTC", direction="nearest",
+                        tolerance=pd.Timedelta(seconds=tolerance_s), suffixes=("1", "2"))
+    par = par.dropna(subset=["Lat2", "Lon2"]).reset_index(drop=True)
+    twd = par.pop("_twd").to_numpy(float)
+    if par.empty:
+        return par.assign(Dist_Eje=np.array([], dtype=float), Dist_Peldaño=np.array([], dtype=float))
+
+    lat1, lon1 = par["Lat1"].to_numpy(float), par["Lon1"].to_numpy(float)
+    lat2, lon2 = par["Lat2"].to_numpy(float), par["Lon2"].to_numpy(float)
+    par["Dist_Eje"] = distance_on_axis(lat1, lon1, lat2, lon2, twd)
+    # Una sola zona UTM para toda la serie (centroide del barco 1)
+    par["Dist_Peldaño"] = ladder_distance_rung(lat1, lon1, lat2, lon2, twd, epsg=utm_epsg(lat1, lon1))
+    return par
+
+def fleet_separation_matrix(lats, lons, twd_deg):
+    """
+    Separación entre todos los pares de barcos de una flota en una sola llamada.
+    lats/lons: arrays (n,) con la posición de cada barco en un instante, o (t, n)
+    para t instantes sincronizados (twd_deg escalar o (t,)).
+    Devuelve {"eje": M, "peldaño": M}, con M de forma (n, n) o (t, n, n), donde
+    M[..., i, j] es la posición del barco j respecto al barco i.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    twd = np.asarray(twd_deg, dtype=float)
+    twd = twd.reshape(twd.shape + (1,) * (lats.ndim - twd.ndim))
+    if lats.size == 0:
+        vacia = np.empty(lats.shape + lats.shape[-1:])
+        return {"eje": vacia, "peldaño": vacia.copy()}
+
+    eje = distance_on_axis(lats[..., :, None], lons[..., :, None],
+                           lats[..., None, :], lons[..., None, :], twd[..., None])
+    d = _rung_projection(lats, lons, twd, utm_epsg(lats, lons))
+    peldaño = d[..., None, :] - d[..., :, None]
+    return {"eje": eje, "peldaño": peldaño}
+
 
 def haversine(lat1, lon1, lat2, lon2):
     # Devuelve distancia en metros
@@ -436,3 +1752,255 @@ def sog_modes(df, bin_width=0.5, top_n=2):
 
     return modes
 
+
+# --- Detección de maniobras por COG ---
+def rolling_circmean_deg(angles, window):
+    """
+    Media circular (grados, [0,360)) de todas las ventanas de `window` puntos
+    consecutivos, con sumas acumuladas de sin/cos: O(n) para todo el track.
+    Devuelve un array de n - window + 1 valores; el valor k corresponde a
+    angles[k : k + window]. Una ventana con algún NaN da NaN (como circmean).
+    """
+    rad = np.radians(np.asarray(angles, dtype=float))
+    nan = np.isnan(rad)
+    c_sin = np.concatenate(([0.0], np.cumsum(np.where(nan, 0.0, np.sin(rad)))))
+    c_cos = np.concatenate(([0.0], np.cumsum(np.where(nan, 0.0, np.cos(rad)))))
+    c_nan = np.concatenate(([0], np.cumsum(nan)))
+    s = c_sin[window:] - c_sin[:-window]
+    c = c_cos[window:] - c_cos[:-window]
+    media = np.mod(np.degrees(np.arctan2(s, c)), 360.0)
+    media[(c_nan[window:] - c_nan[:-window]) > 0] = np.nan
+    return media
+
+def detectar_maniobras_cog(df, umbral=30, window=10):
+    """
+    Detecta maniobras por cambio de COG en cada track de df (columnas UTC, COG, Track).
+    Para cada punto i compara su COG con la media circular de los `window` puntos
+    anteriores y de los `window` posteriores; si la mayor diferencia supera `umbral`
+    (grados) es candidato a maniobra.
+    Devuelve un DataFrame con UTC, COG, COG_previo, COG_post, Track, idx, pos
+    (idx: posición del punto dentro del track ordenado por UTC;
+    pos: posición de la fila en df, para traer otras columnas sin merge).
+    """
+    columnas = ["UTC", "COG", "COG_previo", "COG_post", "Track", "idx", "pos"]
+    partes = []
+    if df.empty:
+        return pd.DataFrame(columns=columnas)
+    df = df[['UTC', 'COG', 'Track']].assign(_pos=np.arange(len(df)))
+    for track in df['Track'].unique():
+        track_df = df[df['Track'] == track].sort_values('UTC')
+        # Asegura dominio [0,360) para cálculos circulares
+        cogs = np.mod(track_df['COG'].values, 360.0)
+        n = len(cogs)
+        if n <= 2 * window:
+            continue
+
+        medias = rolling_circmean_deg(cogs, window)
+        idx = np.arange(window, n - window)
+        media_prev = medias[idx - window]       # cogs[i - window : i]
+        media_post = medias[idx + 1]            # cogs[i + 1 : i + 1 + window]
+
+        # Diferencias CIRCULARES con el punto actual; la mayor es la "intensidad"
+        cog_i = cogs[idx].astype(float)
+        diff_prev = np.abs((cog_i - media_prev + 180) % 360 - 180)
+        diff_post = np.abs((cog_i - media_post + 180) % 360 - 180)
+        mask = np.where(diff_post > diff_prev, diff_post, diff_prev) > umbral
+        if not mask.any():
+            continue
+
+        sel = idx[mask]
+        partes.append(pd.DataFrame({
+            "UTC": track_df['UTC'].values[sel],
+            "COG": cogs[sel],
+            "COG_previo": media_prev[mask],
+            "COG_post": media_post[mask],
+            "Track": track,
+            "idx": sel,
+            "pos": track_df['_pos'].values[sel],
+        }))
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    return pd.concat(partes, ignore_index=True)
+
+def filtrar_maniobras_cercanas(maniobra_df, tiempo_minimo):
+    """
+    Descarta, en cada track, las maniobras a menos de `tiempo_minimo` segundos de
+    la última conservada (gana la primera). En vez de recorrer fila a fila, salta
+    con searchsorted a la siguiente maniobra permitida: O(k log n) por track.
+    Devuelve maniobra_df ordenado por Track y UTC, solo con las filas conservadas.
+    """
+    if maniobra_df.empty:
+        return maniobra_df
+    maniobra_df = maniobra_df.sort_values(['Track', 'UTC']).reset_index(drop=True)
+    t = maniobra_df['UTC'].values.astype('datetime64[ns]').astype(np.int64)
+    paso = int(round(tiempo_minimo * 1e9))
+    if paso <= 0:
+        # Sin separación mínima se conservan todas (searchsorted no avanzaría)
+        return maniobra_df
+    tracks = maniobra_df['Track'].to_numpy()
+    cortes = np.r_[0, np.flatnonzero(tracks[1:] != tracks[:-1]) + 1, len(t)]
+
+    keep = []
+    for i0, i1 in zip(cortes[:-1], cortes[1:]):
+        i = i0
+        while i < i1:
+            keep.append(i)
+            i = i0 + int(np.searchsorted(t[i0:i1], t[i] + paso, side='left'))
+    return maniobra_df.iloc[keep].reset_index(drop=True)
+
+# --- Ventanas temporales sobre un track (searchsorted + sumas prefijas) ---
+def _to_ns(utc):
+    """Instantes (array, Series o escalar) → int64 en nanosegundos."""
+    return np.asarray(utc, dtype='datetime64[ns]').astype(np.int64)
+
+def indice_temporal(utc, valores):
+    """
+    Ordena un track una sola vez por UTC y prepara sumas prefijas de `valores`
+    (ignorando NaN), para responder medias en cualquier ventana en O(log n).
+    """
+    t = _to_ns(utc)
+    orden = np.argsort(t, kind='stable')
+    v = np.asarray(valores, dtype=float)[orden]
+    validos = ~np.isnan(v)
+    return {
+        "t": t[orden],
+        "suma": np.concatenate(([0.0], np.cumsum(np.where(validos, v, 0.0)))),
+        "n": np.concatenate(([0], np.cumsum(validos))),
+    }
+
+def medias_en_ventanas(indice, t_ini, t_fin):
+    """
+    Media de los valores con UTC en [t_ini, t_fin] (ambos incluidos) para cada
+    par de extremos (int64 ns, cualquier forma). NaN si la ventana no tiene datos.
+    """
+    lo = np.searchsorted(indice["t"], t_ini, side='left')
+    hi = np.searchsorted(indice["t"], t_fin, side='right')
+    n = indice["n"][hi] - indice["n"][lo]
+    suma = indice["suma"][hi] - indice["suma"][lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, suma / np.maximum(n, 1), np.nan)
+
+def velocidad_en_maniobras(utc, sog, tiempos, ventanas, t_prev=8, t_post_max=30):
+    """
+    SOG alrededor de cada maniobra de un track:
+    - sog_previa: media en [t - t_prev, t].
+    - recuperacion: primer segundo s (1..t_post_max) cuya media en [t+s-0.5, t+s+0.5]
+      alcanza sog_previa; t_post_max + 1 si no se recupera.
+    - medias: (m, len(ventanas)); ventana 0 → [t-0.5, t+0.5], negativa → [t+d, t],
+      positiva → [t, t+d] (segundos).
+    """
+    indice = indice_temporal(utc, sog)
+    t = _to_ns(tiempos)[:, None]
+    seg = 1_000_000_000
+    medio = seg // 2
+
+    sog_previa = medias_en_ventanas(indice, t[:, 0] - t_prev * seg, t[:, 0])
+
+    pasos = np.arange(1, t_post_max + 1) * seg
+    sog_post = medias_en_ventanas(indice, t + pasos - medio, t + pasos + medio)
+    with np.errstate(invalid='ignore'):
+        # Tolerancia mínima: las sumas prefijas no dan medias bit a bit idénticas
+        ok = sog_post >= sog_previa[:, None] - 1e-9
+    recuperacion = np.where(ok.any(axis=1), ok.argmax(axis=1) + 1, t_post_max + 1)
+
+    d = np.asarray(ventanas, dtype=np.int64) * seg
+    ini = np.where(d == 0, -medio, np.minimum(d, 0))
+    fin = np.where(d == 0, medio, np.maximum(d, 0))
+    medias = medias_en_ventanas(indice, t + ini, t + fin)
+    return {"sog_previa": sog_previa, "recuperacion": recuperacion, "medias": medias}
+
+# --- Mejor / peor tramo por VMG (ventanas temporales dentro de segmentos continuos) ---
+def segmentos_continuos(mask, t_ns, max_gap_s=None):
+    """
+    Run-length de un track ordenado por UTC: etiqueta cada racha contigua de puntos
+    con mask True (y sin huecos de más de max_gap_s entre puntos) con un entero
+    creciente; los puntos fuera de mask llevan -1.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    corte = np.zeros(mask.size, dtype=bool)
+    corte[1:] = mask[1:] != mask[:-1]
+    if max_gap_s is not None:
+        corte[1:] |= np.diff(t_ns) > max_gap_s * 1_000_000_000
+    segmento = np.cumsum(corte)
+    segmento[~mask] = -1
+    return segmento
+
+def _top_ventanas(medias, fin, top_k, maximizar):
+    """Inicios de las top_k ventanas [i, fin[i]] sin solape (gana la primera en empates)."""
+    # Redondeo: las sumas acumuladas no dan medias bit a bit idénticas y los empates
+    # deben resolverse a favor de la primera ventana
+    puntuacion = np.round(medias if maximizar else -medias, 9)
+    elegidos = []
+    for _ in range(top_k):
+        if np.isnan(puntuacion).all():
+            break
+        i = int(np.nanargmax(puntuacion))
+        elegidos.append(i)
+        # Bloquea las ventanas que se solapan con [i, fin[i]] (fin es no decreciente)
+        puntuacion[np.searchsorted(fin, i, side='left'): fin[i] + 1] = np.nan
+    return elegidos
+
+def ventanas_extremas(t_ns, valores, segmento, ventana_s, top_k=1):
+    """
+    Ventanas de ventana_s segundos que empiezan en cada punto i: puntos con UTC en
+    [t_i, t_i + ventana_s]. Solo valen si caben enteras en el segmento continuo de i
+    (segmento >= 0, ver segmentos_continuos). Medias con sumas acumuladas
+    (los NaN se ignoran como en pandas) y searchsorted: una sola pasada, O(n log n).
+    Devuelve (medias, fin, {"max": [i0, ...], "min": [i0, ...]}); fin[i] es el
+    último punto de la ventana que empieza en i y medias[i] es NaN si no vale.
+    """
+    t_ns = np.asarray(t_ns, dtype=np.int64)
+    v = np.asarray(valores, dtype=float)
+    segmento = np.asarray(segmento)
+    paso = int(round(ventana_s * 1_000_000_000))
+    fin = np.searchsorted(t_ns, t_ns + paso, side='right') - 1
+    if not len(t_ns):
+        return np.array([], dtype=float), fin, {"max": [], "min": []}
+
+    # Último punto de cada segmento: la ventana debe llegar a t_i + ventana_s sin salirse
+    cambios = np.flatnonzero(segmento[1:] != segmento[:-1])
+    ultimo = np.concatenate((cambios, [len(t_ns) - 1]))[np.searchsorted(cambios, np.arange(len(t_ns)), side='left')]
+    valida = (segmento >= 0) & (t_ns[ultimo] >= t_ns + paso)
+    fin = np.minimum(fin, ultimo)
+
+    validos = ~np.isnan(v)
+    suma = np.concatenate(([0.0], np.cumsum(np.where(validos, v, 0.0))))
+    n = np.concatenate(([0], np.cumsum(validos)))
+    cuenta = n[fin + 1] - n[:-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias = (suma[fin + 1] - suma[:-1]) / np.maximum(cuenta, 1)
+    medias[~valida | (cuenta == 0)] = np.nan
+    return medias, fin, {
+        "max": _top_ventanas(medias, fin, top_k, maximizar=True),
+        "min": _top_ventanas(medias, fin, top_k, maximizar=False),
+    }
+
+def tramos_vmg_extremos(df, ventana_s, rango_twa, top_k=1, max_gap_s=10):
+    """
+    Mejores y peores tramos de ventana_s segundos por VMG medio de un track
+    (UTC, VMG, TWA, Dist), sin salir de la banda |TWA| en rango_twa ni saltar
+    huecos de grabación de más de max_gap_s. Una sola pasada para ambos.
+    Devuelve {"max": [tramo, ...], "min": [tramo, ...]} con, por tramo:
+    i0, i1 (posiciones en el track ordenado, i1 incluida), VMG, Dist (suma),
+    UTC_ini, UTC_fin, TWA_ini, TWA_fin.
+    """
+    df = df.sort_values("UTC", kind="stable")
+    t = df["UTC"].values.astype("datetime64[ns]").astype(np.int64)
+    twa = df["TWA"].to_numpy(dtype=float)
+    en_banda = (np.abs(twa) >= rango_twa[0]) & (np.abs(twa) <= rango_twa[1])
+    segmento = segmentos_continuos(en_banda, t, max_gap_s)
+
+    medias, fin, extremos = ventanas_extremas(t, df["VMG"].to_numpy(dtype=float), segmento, ventana_s, top_k)
+    dist = np.nan_to_num(df["Dist"].to_numpy(dtype=float)) if "Dist" in df else np.zeros(len(df))
+    dist_acum = np.concatenate(([0.0], np.cumsum(dist)))
+    utc = df["UTC"].to_numpy()
+
+    def tramo(i0):
+        i1 = int(fin[i0])
+        return {
+            "i0": i0, "i1": i1, "VMG": float(medias[i0]),
+            "Dist": float(dist_acum[i1 + 1] - dist_acum[i0]),
+            "UTC_ini": utc[i0], "UTC_fin": utc[i1],
+            "TWA_ini": twa[i0], "TWA_fin": twa[i1],
+        }
+    return {clave: [tramo(i0) for i0 in idx] for clave, idx in extremos.items()}